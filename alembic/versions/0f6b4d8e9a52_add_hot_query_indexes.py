@@ -0,0 +1,40 @@
+"""add hot query indexes
+
+Revision ID: 0f6b4d8e9a52
+Revises: d5a8f2c37e19
+Create Date: 2026-10-17 22:16:40.774512
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = "0f6b4d8e9a52"
+down_revision = "d5a8f2c37e19"
+branch_labels = None
+depends_on = None
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    # the sample and annotation tables are large and written to by the QA page, build the indexes without blocking writes
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_sample_delivery_filename",
+            "sample",
+            ["dataset_id", "filename"],
+            postgresql_where=sa.text("is_selected_for_delivery"),
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_annotation_annotator_created_at",
+            "annotation",
+            ["annotator_id", sa.text("created_at DESC")],
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_annotation_annotator_created_at", table_name="annotation", postgresql_concurrently=True)
+        op.drop_index("ix_sample_delivery_filename", table_name="sample", postgresql_concurrently=True)
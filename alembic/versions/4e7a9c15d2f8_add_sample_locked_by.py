@@ -0,0 +1,26 @@
+"""add sample locked_by
+
+Revision ID: 4e7a9c15d2f8
+Revises: 8c2f0d41a6b3
+Create Date: 2026-10-17 20:31:47.902114
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = "4e7a9c15d2f8"
+down_revision = "8c2f0d41a6b3"
+branch_labels = None
+depends_on = None
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.add_column("sample", sa.Column("locked_by", sa.Integer(), nullable=True))
+    op.create_foreign_key("sample_locked_by_fkey", "sample", "annotator", ["locked_by"], ["id"])
+
+
+def downgrade():
+    op.drop_constraint("sample_locked_by_fkey", "sample", type_="foreignkey")
+    op.drop_column("sample", "locked_by")
@@ -0,0 +1,25 @@
+"""add sample dataset_id id index
+
+Revision ID: 6a3c9e1f7b40
+Revises: 0f6b4d8e9a52
+Create Date: 2026-10-17 22:48:03.215940
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = "6a3c9e1f7b40"
+down_revision = "0f6b4d8e9a52"
+branch_labels = None
+depends_on = None
+
+from alembic import op
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        op.create_index("ix_sample_dataset_id_id", "sample", ["dataset_id", "id"], postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_sample_dataset_id_id", table_name="sample", postgresql_concurrently=True)
@@ -0,0 +1,37 @@
+"""add next sample indexes
+
+Revision ID: 8c2f0d41a6b3
+Revises:
+Create Date: 2026-10-17 20:05:12.418305
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = "8c2f0d41a6b3"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    # concurrent builds do not lock the tables against writes, but can not run inside a transaction
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_sample_next_candidate",
+            "sample",
+            ["dataset_id", "is_selected_for_delivery", "islocked", sa.text("wer DESC")],
+            postgresql_where=sa.text(
+                'local_trimmed_path IS NOT NULL AND "s3TrimmedPath" IS NOT NULL AND asr_text IS NOT NULL AND trimmed_audio_duration IS NOT NULL'
+            ),
+            postgresql_concurrently=True,
+        )
+        op.create_index("ix_annotation_sample_id", "annotation", ["sample_id"], postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_annotation_sample_id", table_name="annotation", postgresql_concurrently=True)
+        op.drop_index("ix_sample_next_candidate", table_name="sample", postgresql_concurrently=True)
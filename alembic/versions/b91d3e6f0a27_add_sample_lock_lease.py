@@ -0,0 +1,36 @@
+"""add sample lock lease
+
+Revision ID: b91d3e6f0a27
+Revises: 4e7a9c15d2f8
+Create Date: 2026-10-17 21:02:33.517640
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = "b91d3e6f0a27"
+down_revision = "4e7a9c15d2f8"
+branch_labels = None
+depends_on = None
+
+import os
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.add_column("sample", sa.Column("expires_at", sa.DateTime(), nullable=True))
+    # give the locks taken before the lease model a lease so that the reaper can release them, as long as the leases
+    # of the api (db_utils.lease_expiry)
+    lease_min = float(os.getenv("MAX_LOCKING_MIN", 5))
+    op.execute(
+        sa.text("UPDATE sample SET expires_at = COALESCE(locked_at, now()) + make_interval(secs => :lease_sec) WHERE islocked").bindparams(
+            lease_sec=lease_min * 60
+        )
+    )
+    op.create_index("ix_sample_lease_expiry", "sample", ["expires_at"], postgresql_where=sa.text("islocked"))
+
+
+def downgrade():
+    op.drop_index("ix_sample_lease_expiry", table_name="sample")
+    op.drop_column("sample", "expires_at")
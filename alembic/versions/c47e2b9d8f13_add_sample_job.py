@@ -0,0 +1,43 @@
+"""add sample job
+
+Revision ID: c47e2b9d8f13
+Revises: 6a3c9e1f7b40
+Create Date: 2026-10-17 23:31:27.604118
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = "c47e2b9d8f13"
+down_revision = "6a3c9e1f7b40"
+branch_labels = None
+depends_on = None
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.create_table(
+        "sample_job",
+        sa.Column("sample_id", sa.Integer(), nullable=False),
+        sa.Column("stage", sa.String(length=20), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("last_error", sa.String(length=500), nullable=True),
+        sa.Column("next_retry_at", sa.DateTime(), nullable=False),
+        sa.Column("claimed_by", sa.String(length=120), nullable=True),
+        sa.Column("lease_until", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["sample_id"], ["sample.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("sample_id"),
+    )
+    op.create_index(
+        "ix_sample_job_claimable",
+        "sample_job",
+        ["next_retry_at"],
+        postgresql_where=sa.text("stage IN ('pending', 'trimmed')"),
+    )
+
+
+def downgrade():
+    op.drop_index("ix_sample_job_claimable", table_name="sample_job")
+    op.drop_table("sample_job")
@@ -0,0 +1,47 @@
+"""add dataset progress
+
+Revision ID: d5a8f2c37e19
+Revises: b91d3e6f0a27
+Create Date: 2026-10-17 21:48:05.260931
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = "d5a8f2c37e19"
+down_revision = "b91d3e6f0a27"
+branch_labels = None
+depends_on = None
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.create_table(
+        "dataset_progress",
+        sa.Column("dataset_id", sa.Integer(), nullable=False),
+        sa.Column("n_samples", sa.Integer(), nullable=False),
+        sa.Column("n_selected", sa.Integer(), nullable=False),
+        sa.Column("n_annotated", sa.Integer(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["dataset_id"], ["dataset.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("dataset_id"),
+    )
+    # seed the counters of the existing datasets
+    op.execute(
+        """
+        INSERT INTO dataset_progress (dataset_id, n_samples, n_selected, n_annotated, updated_at)
+        SELECT dataset.id,
+            COUNT(sample.id),
+            COUNT(sample.id) FILTER (WHERE sample.is_selected_for_delivery),
+            COUNT(sample.id) FILTER (WHERE sample.is_selected_for_delivery AND EXISTS (SELECT 1 FROM annotation WHERE annotation.sample_id = sample.id)),
+            now()
+        FROM dataset
+        LEFT JOIN sample ON sample.dataset_id = dataset.id
+        GROUP BY dataset.id
+        """
+    )
+
+
+def downgrade():
+    op.drop_table("dataset_progress")
@@ -0,0 +1,38 @@
+"""add dataset progress n_ready
+
+Revision ID: e3b7a1c94d25
+Revises: c47e2b9d8f13
+Create Date: 2026-10-18 10:12:44.309127
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = "e3b7a1c94d25"
+down_revision = "c47e2b9d8f13"
+branch_labels = None
+depends_on = None
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.add_column("dataset_progress", sa.Column("n_ready", sa.Integer(), nullable=False, server_default="0"))
+    # seed the counter of the existing datasets with the samples QA serves
+    op.execute(
+        """
+        UPDATE dataset_progress SET n_ready = (
+            SELECT COUNT(*) FROM sample
+            WHERE sample.dataset_id = dataset_progress.dataset_id
+                AND sample.is_selected_for_delivery
+                AND sample.local_trimmed_path IS NOT NULL
+                AND sample."s3TrimmedPath" IS NOT NULL
+                AND sample.asr_text IS NOT NULL
+                AND sample.trimmed_audio_duration IS NOT NULL
+        )
+        """
+    )
+
+
+def downgrade():
+    op.drop_column("dataset_progress", "n_ready")
@@ -0,0 +1,93 @@
+"""Throughput and latency of the ASR backend under a given concurrency.
+
+Submits n clips at once through the same client as the trim/ASR backfill and reports the throughput, the latency
+percentiles and the failures. The fake backend (the default) needs no network, its latency profile and failure
+rate stand in for the provider's, so the ASR_CONCURRENCY_* and ASR_* retry settings can be tuned offline.
+
+Usage:
+    python scripts/benchmark_asr.py --n-clips 2000 --concurrency 16 32 64 --latency-ms 2000 --failure-rate 0.02
+"""
+import argparse
+import os
+import sys
+import time
+from collections import Counter
+
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from src.utils.asr_client import ASRClient, ASRError, FakeASRBackend
+
+
+def benchmark(client, provider: str, model_id: str, clips: list) -> dict:
+    latencies, failures = [], Counter()
+    start = time.perf_counter()
+
+    def done(future, submitted):
+        latencies.append(time.perf_counter() - submitted)
+        if future.exception() is not None:
+            failures[type(future.exception()).__name__] += 1
+
+    futures = []
+    for clip in clips:
+        future = client.submit(provider, model_id, clip)
+        future.add_done_callback(lambda f, submitted=time.perf_counter(): done(f, submitted))
+        futures.append(future)
+    for future in futures:
+        try:
+            future.result()
+        except ASRError:
+            pass
+    elapsed = time.perf_counter() - start
+    return {
+        "elapsed": elapsed,
+        "throughput": len(clips) / elapsed,
+        "p50": np.percentile(latencies, 50),
+        "p95": np.percentile(latencies, 95),
+        "p99": np.percentile(latencies, 99),
+        "failures": dict(failures),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=["fake", "aixplain"], default="fake")
+    parser.add_argument("--provider", choices=["aws", "azure"], default="aws")
+    parser.add_argument("--model-id", default="60ddef908d38c51c5885dd1e", help="defaults to the english aws model")
+    parser.add_argument("--clips", nargs="*", default=None, help="s3 paths to transcribe, cycled over; required with --backend aixplain")
+    parser.add_argument("--n-clips", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[16], help="jobs in flight, one run per value")
+    parser.add_argument("--latency-ms", type=float, default=2000, help="fake backend: mean latency of a job")
+    parser.add_argument("--jitter", type=float, default=0.5, help="fake backend: standard deviation of the latency, relative to the mean")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="fake backend: fraction of the attempts failing")
+    parser.add_argument("--max-attempts", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.backend == "aixplain" and not args.clips:
+        parser.error("--clips is required with --backend aixplain")
+    sources = args.clips or [f"s3://benchmark/clip_{i}.wav" for i in range(args.n_clips)]
+    clips = [sources[i % len(sources)] for i in range(args.n_clips)]
+
+    print(f"{args.n_clips} clips on the {args.backend} backend ({args.provider})")
+    print(f"{'concurrency':>11} {'elapsed s':>10} {'clips/s':>8} {'p50 s':>7} {'p95 s':>7} {'p99 s':>7}  failures")
+    for concurrency in args.concurrency:
+        kwargs = {"concurrency": {args.provider: concurrency}, "max_attempts": args.max_attempts}
+        if args.backend == "fake":
+            client = FakeASRBackend(latency_ms=args.latency_ms, jitter=args.jitter, failure_rate=args.failure_rate, seed=args.seed, **kwargs)
+        else:
+            client = ASRClient(**kwargs)
+        try:
+            result = benchmark(client, args.provider, args.model_id, clips)
+        finally:
+            client.close()
+        print(
+            f"{concurrency:>11} {result['elapsed']:>10.1f} {result['throughput']:>8.1f} "
+            f"{result['p50']:>7.2f} {result['p95']:>7.2f} {result['p99']:>7.2f}  {result['failures'] or '-'}"
+        )
+
+
+if __name__ == "__main__":
+    main()
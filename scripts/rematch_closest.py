@@ -1,6 +1,7 @@
+import argparse
 import os
+import sys
 
-import editdistance
 import numpy as np
 import pandas as pd
 import psycopg2
@@ -26,8 +27,14 @@ db_user = os.getenv("POSTGRES_USER")
 db_password = os.getenv("POSTGRES_PWD")
 
 
-def edit_distance(s1, s2):
-    return editdistance.eval(s1, s2)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils.alignment_utils import match_sentences
+
+
+parser = argparse.ArgumentParser(description="Find the samples whose asr matches the text of another sample")
+parser.add_argument("--band", type=int, default=500, help="samples on each side of the last match the asr is compared to, 0 compares to all")
+args = parser.parse_args()
 
 
 for dataset in ["German(Dorothee)"]:
@@ -37,7 +44,8 @@ for dataset in ["German(Dorothee)"]:
     SELECT dataset.name, sample.id, sample.filename, sample.local_trimmed_path, sample.original_text, sample.asr_text, sample.wer, sample.trimmed_audio_duration as duration
     FROM sample
     JOIN dataset ON sample.dataset_id = dataset.id
-    WHERE dataset.name LIKE '%' || '{dataset}' || '%';
+    WHERE dataset.name LIKE '%' || '{dataset}' || '%'
+    ORDER BY sample.filename;
     """
 
     # Connect to the database
@@ -77,20 +85,8 @@ for dataset in ["German(Dorothee)"]:
 
         segments_list = [v for k, v in segments.items()]
         sentences_list = [v for k, v in sentences.items()]
-        distances_matrix = np.ones((len(segments_list), len(sentences))) * 1000
-
-        for ik in tqdm(range(len(segments_list))):
-            # for jk in range(ik-500, min(len(segments_list), ik+500)):
-            for jk in range(len(sentences_list)):
-                try:
-                    distances_matrix[ik, jk] = edit_distance(segments_list[ik]["asr_text"], sentences_list[jk]) / min(
-                        len(segments_list[ik]["asr_text"]), len(sentences_list[jk])
-                    )
-                except:
-                    distances_matrix[ik, jk] = np.inf
-
-        # get the best match for each segment
-        best_matches = np.argmin(distances_matrix, axis=1)
+        # the samples are in script order, each one is compared to the sentences around the previous match
+        best_matches, best_distances = match_sentences([segment["asr_text"] for segment in segments_list], sentences_list, args.band)
         best_matched_sentences = [sentences_list[k] for k in best_matches]
 
         # # make a dataframe
@@ -101,7 +97,7 @@ for dataset in ["German(Dorothee)"]:
         for ik in tqdm(range(len(segments_list))):
             asr = segments_list[ik]["asr_text"]
             sentence = best_matched_sentences[ik]
-            ed_dist = distances_matrix[ik, best_matches[ik]]
+            ed_dist = best_distances[ik]
             try:
                 len_dif = abs(len(asr) - len(sentence)) / min(len(asr), len(sentence))
             except:
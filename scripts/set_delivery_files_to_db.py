@@ -30,6 +30,25 @@ db_password = os.getenv("POSTGRES_PWD")
 total_hours = 30
 include_extras = False
 
+# recompute the progress counters of the dataset, see src.service.models.DatasetProgress
+refresh_progress_sql = """
+    INSERT INTO dataset_progress (dataset_id, n_samples, n_selected, n_annotated, updated_at)
+    SELECT dataset.id,
+        COUNT(sample.id),
+        COUNT(sample.id) FILTER (WHERE sample.is_selected_for_delivery),
+        COUNT(sample.id) FILTER (WHERE sample.is_selected_for_delivery AND EXISTS (SELECT 1 FROM annotation WHERE annotation.sample_id = sample.id)),
+        now()
+    FROM dataset
+    LEFT JOIN sample ON sample.dataset_id = dataset.id
+    WHERE dataset.name = %s
+    GROUP BY dataset.id
+    ON CONFLICT (dataset_id) DO UPDATE SET
+        n_samples = EXCLUDED.n_samples,
+        n_selected = EXCLUDED.n_selected,
+        n_annotated = EXCLUDED.n_annotated,
+        updated_at = EXCLUDED.updated_at;
+"""
+
 from tqdm import tqdm
 
 
@@ -69,7 +88,6 @@ for dataset_str in [
     """
 
     cur.execute(sql_script)
-    conn.commit()
 
     # update all samples to is_seslected_for_delivery = true
     for filename in tqdm(filenames):
@@ -86,4 +104,6 @@ for dataset_str in [
                 """
         )
 
-        conn.commit()
+    # the selection and the progress counters are committed together
+    cur.execute(refresh_progress_sql, (dataset_str,))
+    conn.commit()
@@ -1,8 +1,10 @@
+import asyncio
 import os
 
 from dotenv import load_dotenv
 from fastapi import FastAPI
 from fastapi_sqlalchemy import DBSessionMiddleware
+from starlette.concurrency import run_in_threadpool
 from starlette.middleware.cors import CORSMiddleware
 
 from src.logger import root_logger
@@ -10,6 +12,7 @@ from src.paths import paths
 from src.service.annotators import router as annotators_router
 from src.service.datasets import router as datasets_router
 from src.service.samples import router as samples_router
+from src.utils import db_utils
 
 
 app_logger = root_logger.getChild("api")
@@ -41,3 +44,28 @@ app.include_router(annotators_router)
 @app.get("/")
 def read_root():
     return {"message": "Welcome to the TTS QA API"}
+
+
+async def reap_expired_locks(interval: float):
+    # release expired lock leases in the background so that the request path never has to
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await run_in_threadpool(db_utils.expire_locks)
+        except Exception as e:
+            app_logger.error(f"Failed to reap expired locks. Error: {e}")
+
+
+@app.on_event("startup")
+async def start_lock_reaper():
+    interval = float(os.getenv("LOCK_REAPER_INTERVAL_SEC", 60))
+    # a non positive interval disables the reaper, expire_locks can then be scheduled externally
+    if interval > 0:
+        app.state.lock_reaper = asyncio.create_task(reap_expired_locks(interval))
+
+
+@app.on_event("shutdown")
+async def stop_lock_reaper():
+    lock_reaper = getattr(app.state, "lock_reaper", None)
+    if lock_reaper is not None:
+        lock_reaper.cancel()
@@ -1,15 +1,17 @@
+from datetime import datetime
 from typing import Optional
 
 from pydantic import BaseModel, Field
 from pydantic_sqlalchemy import sqlalchemy_to_pydantic
 
-from src.service.models import Annotation, Annotator, Dataset, Sample
+from src.service.models import Annotation, Annotator, Dataset, DatasetProgress, Sample
 
 
 BaseAnnotatorModel = sqlalchemy_to_pydantic(Annotator)
 BaseAnnotationModel = sqlalchemy_to_pydantic(Annotation)
 BaseSampleModel = sqlalchemy_to_pydantic(Sample)
 BaseDatasetModel = sqlalchemy_to_pydantic(Dataset)
+BaseDatasetProgressModel = sqlalchemy_to_pydantic(DatasetProgress)
 
 
 class AnnotatorModel(BaseAnnotatorModel):  # type: ignore
@@ -36,6 +38,12 @@ class DatasetModel(BaseDatasetModel):  # type: ignore
     pass
 
 
+class DatasetProgressModel(BaseDatasetProgressModel):  # type: ignore
+    """The dataset progress model."""
+
+    pass
+
+
 class InfoModel(BaseModel):
     """The error model."""
 
@@ -52,6 +60,13 @@ class InfoModel(BaseModel):
         }
 
 
+class LeaseModel(BaseModel):
+    """The lock lease model."""
+
+    sample_id: int = Field(..., description="The locked sample id")
+    expires_at: datetime = Field(..., description="The time at which the lock is released unless renewed")
+
+
 class InputAnnotationModel(BaseModel):
     """The input annotation model."""
 
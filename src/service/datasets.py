@@ -1,11 +1,16 @@
 import asyncio
+import csv
+import io
+import json
 import traceback
-from typing import List, Union
+from itertools import islice
+from typing import Iterator, List, Union
 
 from fastapi import APIRouter
+from fastapi.responses import StreamingResponse
 
 from src.logger import root_logger
-from src.service.bases import AnnotationModel, AnnotatorModel, DatasetModel, InfoModel, SampleModel  # noqa: F401
+from src.service.bases import AnnotationModel, AnnotatorModel, DatasetModel, DatasetProgressModel, InfoModel, SampleModel  # noqa: F401
 from src.utils import db_utils
 
 
@@ -42,6 +47,16 @@ def get_dataset_by_id(id: int) -> Union[DatasetModel, InfoModel]:
         return InfoModel(**{"message": "Failed", "error": str(e)})
 
 
+# get the annotation progress of a dataset
+@router.get("/{id}/progress")
+def get_dataset_progress(id: int) -> Union[DatasetProgressModel, InfoModel]:
+    try:
+        progress = db_utils.get_dataset_progress(id)
+        return DatasetProgressModel(**progress.to_dict())
+    except Exception as e:
+        return InfoModel(**{"message": "Failed", "error": str(e)})
+
+
 # delete a dataset
 @router.delete("/{id}")
 def delete_dataset(id: int) -> Union[DatasetModel, InfoModel]:
@@ -63,12 +78,37 @@ def update_dataset(id: int, name: str = None, language: str = None, description:
         return InfoModel(**{"message": "Failed", "error": str(e)})
 
 
-# list all samples
-@router.get("/{id}/samples")
-def list_samples(id: int, top_k=50) -> List[SampleModel]:
-    samples = db_utils.list_samples(id, top_k)
-    # map the samples to the SampleModel
-    return [SampleModel(**sample.to_dict()) for sample in samples]
+# list the samples of a dataset, pass the id of the last sample as after_id to get the next page
+# fields is a comma separated list of the sample columns to return, top_k is the former name of limit
+# unset fields are left out of the response, so that the samples of a projection only hold the requested columns
+@router.get("/{id}/samples", response_model_exclude_unset=True)
+def list_samples(
+    id: int,
+    limit: int = 50,
+    top_k: int = None,
+    after_id: int = None,
+    fields: str = None,
+    min_wer: float = None,
+    max_wer: float = None,
+    is_valid: bool = None,
+    deliverable: str = None,
+) -> Union[List[SampleModel], List[dict], InfoModel]:
+    try:
+        samples = db_utils.list_samples(
+            id,
+            top_k=top_k or limit,
+            after_id=after_id,
+            fields=fields.split(",") if fields else None,
+            min_wer=min_wer,
+            max_wer=max_wer,
+            is_valid=is_valid,
+            deliverable=deliverable,
+        )
+        if fields:
+            return samples
+        return [SampleModel(**sample) for sample in samples]
+    except Exception as e:
+        return InfoModel(**{"message": "Failed", "error": str(e)})
 
 
 # insert a sample
@@ -108,6 +148,48 @@ def query_next_sample(id: int) -> dict:
         return {"message": "Failed", "error": str(e)}
 
 
+# claim and lock the next sample for an annotator
+@router.post("/{id}/claim")
+def claim_next_sample(id: int, annotator_id: int) -> dict:
+    try:
+        sample, stats = db_utils.claim_next_sample(id, annotator_id)
+        if sample is None:
+            return {"sample": None, "stats": stats}
+        return {"sample": SampleModel(**sample.to_dict()), "stats": stats}  # type: ignore
+    except Exception as e:
+        return {"message": "Failed", "error": str(e)}
+
+
+# claim and lock a batch of samples for an annotator, e.g. to prefetch a local queue
+@router.post("/{id}/claim_batch")
+def claim_batch(id: int, annotator_id: int, n: int = 10) -> dict:
+    try:
+        samples, stats = db_utils.claim_batch(id, annotator_id, n)
+        return {"samples": [SampleModel(**sample.to_dict()) for sample in samples], "stats": stats}
+    except Exception as e:
+        return {"message": "Failed", "error": str(e)}
+
+
+# renew the leases of all the samples the annotator holds in the dataset
+@router.put("/{id}/locks/renew")
+def renew_locks(id: int, annotator_id: int) -> dict:
+    try:
+        sample_ids = db_utils.renew_locks(id, annotator_id)
+        return {"sample_ids": sample_ids}
+    except Exception as e:
+        return {"message": "Failed", "error": str(e)}
+
+
+# release all the samples the annotator holds in the dataset
+@router.put("/{id}/locks/release")
+def release_locks(id: int, annotator_id: int) -> InfoModel:
+    try:
+        db_utils.release_locks(id, annotator_id)
+        return InfoModel(**{"message": "Success"})
+    except Exception as e:
+        return InfoModel(**{"message": "Failed", "error": str(e)})
+
+
 # get the annotations of dataset samples
 @router.get("/{id}/annotations")
 def get_annotations_of_dataset(id: int) -> Union[List[dict], InfoModel]:
@@ -118,6 +200,52 @@ def get_annotations_of_dataset(id: int) -> Union[List[dict], InfoModel]:
         return InfoModel(**{"message": "Failed", "error": str(e)})
 
 
+# get a page of the annotations of dataset samples, pass the returned cursor to get the next page
+@router.get("/{id}/annotations/page")
+def get_annotations_page(id: int, after_filename: str = None, after_id: int = None, limit: int = 1000) -> Union[dict, InfoModel]:
+    try:
+        annotations, cursor = db_utils.get_annotations_page(id, after_filename=after_filename, after_id=after_id, limit=limit)
+        return {"annotations": annotations, "next": cursor}
+    except Exception as e:
+        return InfoModel(**{"message": "Failed", "error": str(e)})
+
+
+def ndjson_lines(rows: Iterator[dict]) -> Iterator[str]:
+    for row in rows:
+        yield json.dumps(row, default=str) + "\n"
+
+
+def csv_chunks(rows: Iterator[dict], chunk_size: int = 1000) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=db_utils.ANNOTATION_EXPORT_FIELDS)
+    writer.writeheader()
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        writer.writerows(chunk)
+        yield buffer.getvalue()
+        if len(chunk) < chunk_size:
+            return
+        buffer.seek(0)
+        buffer.truncate()
+
+
+# stream the annotations of dataset samples as ndjson or csv
+@router.get("/{id}/annotations/export", response_model=None)
+def export_annotations_of_dataset(id: int, format: str = "ndjson") -> Union[StreamingResponse, InfoModel]:
+    try:
+        if format not in ["ndjson", "csv"]:
+            raise ValueError(f"Unknown export format {format}, expected ndjson or csv")
+        # fail before streaming starts, once the response has started the status can not change anymore
+        dataset = db_utils.get_dataset_by_id(id)
+        rows = db_utils.iter_annotations_of_dataset(id)
+        if format == "csv":
+            headers = {"Content-Disposition": f'attachment; filename="{dataset.name}_annotations.csv"'}
+            return StreamingResponse(csv_chunks(rows), media_type="text/csv", headers=headers)
+        return StreamingResponse(ndjson_lines(rows), media_type="application/x-ndjson")
+    except Exception as e:
+        return InfoModel(**{"message": "Failed", "error": str(e)})
+
+
 def handle_exceptions(task: asyncio.Task):
     if task.exception():
         print(f"An error occurred in the task: {task.exception()}")
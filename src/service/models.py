@@ -1,6 +1,6 @@
 import enum
 
-from sqlalchemy import Boolean, Column, DateTime, Enum, Float, ForeignKey, func, Integer, MetaData, String, Table, UniqueConstraint
+from sqlalchemy import and_, Boolean, Column, DateTime, Enum, Float, ForeignKey, func, Index, Integer, MetaData, String, Table, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import backref, relationship
 
@@ -90,6 +90,8 @@ class Sample(Base):  # type: ignore
     uncased_unpunctuated_wer = Column(Float, unique=False, nullable=True)
     islocked = Column(Boolean, default=False, nullable=False)  # this is for locking sample that is being annotated
     locked_at = Column(DateTime, default=None, nullable=True)
+    locked_by = Column(Integer, ForeignKey("annotator.id"), default=None, nullable=True)  # the annotator holding the lock
+    expires_at = Column(DateTime, default=None, nullable=True)  # end of the lock lease, see MAX_LOCKING_MIN
     is_selected_for_delivery = Column(Boolean, default=False, nullable=True)
 
     annotation = relationship("Annotation", cascade="all, delete-orphan", backref="sample")
@@ -99,6 +101,26 @@ class Sample(Base):  # type: ignore
         # UniqueConstraint("filename", name="_filename_uc"),
         # dataset id and sample filename should be unique
         UniqueConstraint("dataset_id", "filename", name="_dataset_id_filename_uc"),
+        # backs the next sample selection: only trimmed and transcribed samples are candidates, highest wer first
+        Index(
+            "ix_sample_next_candidate",
+            dataset_id,
+            is_selected_for_delivery,
+            islocked,
+            wer.desc(),
+            postgresql_where=and_(
+                local_trimmed_path.isnot(None),
+                s3TrimmedPath.isnot(None),
+                asr_text.isnot(None),
+                trimmed_audio_duration.isnot(None),
+            ),
+        ),
+        # lets the lock reaper find expired leases without scanning unlocked samples
+        Index("ix_sample_lease_expiry", expires_at, postgresql_where=islocked == True),
+        # the annotation export walks the delivered samples of a dataset in filename order
+        Index("ix_sample_delivery_filename", dataset_id, filename, postgresql_where=is_selected_for_delivery == True),
+        # keyset pagination of the samples of a dataset
+        Index("ix_sample_dataset_id_id", dataset_id, id),
     )  # Example for such cases combination of filename and s3RawPath should be unique
 
     def __repr__(self):
@@ -174,7 +196,13 @@ class Annotation(Base):  # type: ignore
 
     annotator = relationship("Annotator", backref=backref("annotations", passive_deletes=True))
 
-    __table_args__ = (UniqueConstraint("annotator_id", "sample_id", name="_annotator_sample_uc"),)
+    __table_args__ = (
+        UniqueConstraint("annotator_id", "sample_id", name="_annotator_sample_uc"),
+        # the unique constraint above leads with annotator_id, lookups by sample need their own index
+        Index("ix_annotation_sample_id", "sample_id"),
+        # latest annotation of an annotator
+        Index("ix_annotation_annotator_created_at", annotator_id, created_at.desc()),
+    )
 
     def __repr__(self):
         return f"{self.to_dict()}"
@@ -215,6 +243,7 @@ class Dataset(Base):  # type: ignore
     created_at = Column(DateTime, default=func.now())
 
     samples = relationship("Sample", cascade="all, delete", backref="dataset")
+    progress = relationship("DatasetProgress", uselist=False, cascade="all, delete-orphan", backref="dataset")
     annotators = relationship("Annotator", secondary=annotator_dataset, backref=backref("assigned_datasets", passive_deletes=True))
 
     __table_args__ = (UniqueConstraint("name", name="_name_uc"),)
@@ -224,3 +253,63 @@ class Dataset(Base):  # type: ignore
 
     def to_dict(self):
         return {"id": self.id, "name": self.name, "description": self.description, "language": self.language, "created_at": self.created_at}
+
+
+# Define a DatasetProgress model in which we keep the annotation progress counters of a dataset:
+# they are updated in the same transaction as the samples and annotations they count, so reading them is constant time
+class DatasetProgress(Base):  # type: ignore
+    __tablename__ = "dataset_progress"
+    dataset_id = Column(Integer, ForeignKey("dataset.id", ondelete="CASCADE"), primary_key=True)
+    n_samples = Column(Integer, default=0, nullable=False)  # all the samples of the dataset
+    n_selected = Column(Integer, default=0, nullable=False)  # samples selected for delivery, i.e. the ones to annotate
+    n_ready = Column(Integer, default=0, nullable=False)  # selected samples that are trimmed and transcribed, i.e. the ones QA serves
+    n_annotated = Column(Integer, default=0, nullable=False)  # selected samples with at least one annotation
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"{self.to_dict()}"
+
+    def to_dict(self):
+        return {
+            "dataset_id": self.dataset_id,
+            "n_samples": self.n_samples,
+            "n_selected": self.n_selected,
+            "n_ready": self.n_ready,
+            "n_annotated": self.n_annotated,
+            "updated_at": self.updated_at,
+        }
+
+
+# Define a SampleJob model in which we keep the state of the trim and asr backfill of a sample (see src/utils/trim_asr.py):
+# pending -> trimmed -> done, or failed once max attempts are reached. failed attempts are retried after next_retry_at
+# and a claimed job is skipped by the other workers until its lease ends
+class SampleJob(Base):  # type: ignore
+    __tablename__ = "sample_job"
+    sample_id = Column(Integer, ForeignKey("sample.id", ondelete="CASCADE"), primary_key=True)
+    stage = Column(String(20), default="pending", nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    last_error = Column(String(500), default=None, nullable=True)
+    next_retry_at = Column(DateTime, default=func.now(), nullable=False)
+    claimed_by = Column(String(120), default=None, nullable=True)  # host:pid of the worker holding the job
+    lease_until = Column(DateTime, default=None, nullable=True)
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        # workers claim the due jobs that are not done or failed
+        Index("ix_sample_job_claimable", next_retry_at, postgresql_where=stage.in_(["pending", "trimmed"])),
+    )
+
+    def __repr__(self):
+        return f"{self.to_dict()}"
+
+    def to_dict(self):
+        return {
+            "sample_id": self.sample_id,
+            "stage": self.stage,
+            "attempts": self.attempts,
+            "last_error": self.last_error,
+            "next_retry_at": self.next_retry_at,
+            "claimed_by": self.claimed_by,
+            "lease_until": self.lease_until,
+            "updated_at": self.updated_at,
+        }
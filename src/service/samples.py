@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Union
 
 from fastapi import APIRouter
 
@@ -6,7 +6,7 @@ from fastapi import APIRouter
 router = APIRouter(prefix="/samples", tags=["samples"])
 
 from src.logger import root_logger
-from src.service.bases import InfoModel, InputAnnotationModel, SampleModel  # noqa: F401
+from src.service.bases import InfoModel, InputAnnotationModel, LeaseModel, SampleModel  # noqa: F401
 from src.utils import db_utils
 
 
@@ -48,16 +48,36 @@ def annotate_sample(id: int, annotation: InputAnnotationModel) -> InfoModel:
         return InfoModel(**{"message": "Failed", "error": str(e)})
 
 
+# annotate a sample, release it and claim the next samples in a single round trip
+@router.post("/{id}/annotate_and_next")
+def annotate_and_next(id: int, annotation: InputAnnotationModel, n: int = 1) -> dict:
+    try:
+        samples, stats = db_utils.annotate_and_claim(sample_id=id, n=n, **dict(annotation))
+        return {"samples": [SampleModel(**sample.to_dict()) for sample in samples], "stats": stats}
+    except Exception as e:
+        return {"message": "Failed", "error": str(e)}
+
+
 # lock sample for annotation
 @router.put("/{id}/lock")
-def lock_sample(id: int) -> InfoModel:
+def lock_sample(id: int, annotator_id: int = None) -> InfoModel:
     try:
-        db_utils.lock_sample(id)
+        db_utils.lock_sample(id, annotator_id)
         return InfoModel(**{"message": "Success"})
     except Exception as e:
         return InfoModel(**{"message": "Failed", "error": str(e)})
 
 
+# renew the lock lease of the annotator on the sample
+@router.put("/{id}/lock/renew")
+def renew_lock(id: int, annotator_id: int) -> Union[LeaseModel, InfoModel]:
+    try:
+        expires_at = db_utils.renew_lock(id, annotator_id)
+        return LeaseModel(sample_id=id, expires_at=expires_at)
+    except Exception as e:
+        return InfoModel(**{"message": "Failed", "error": str(e)})
+
+
 # unlock sample for annotation
 @router.put("/{id}/unlock")
 def unlock_sample(id: int) -> InfoModel:
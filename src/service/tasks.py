@@ -2,12 +2,14 @@ import os
 import shutil
 
 from celery import Celery, Task
+from celery.signals import worker_process_init
 from dotenv import load_dotenv
 
 from src.logger import root_logger
 from src.paths import paths
 from src.utils.alignment_utils import align_wavs_vad, align_wavs_whisper  # noqa F401
 from src.utils.db_utils import upload_wav_samples
+from src.utils.registry import warm_up_from_env
 
 
 BASE_DIR = str(paths.PROJECT_ROOT_DIR.resolve())
@@ -40,6 +42,12 @@ app.conf.broker_url = "redis://localhost:6379/0"
 app.conf.result_backend = "redis://localhost:6379/0"
 
 
+@worker_process_init.connect
+def warm_up_models(**kwargs):
+    # build the models listed in WARM_UP_MODELS when a worker process starts instead of in its first job
+    warm_up_from_env()
+
+
 @app.task(bind=True)
 def segmented_onboarding_job(self: Task, dataset_id: int, csv_path: str, deliverable: str = None):
     # Simulate a long-running job
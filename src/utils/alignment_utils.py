@@ -8,18 +8,17 @@ import traceback
 from glob import glob
 from typing import Tuple
 
-import editdistance
 import numpy as np
 import pandas as pd
 from celery import Task
-from pyannote.audio import Model
-from pyannote.audio.pipelines import VoiceActivityDetection
 from pydub import AudioSegment
+from rapidfuzz import process
+from rapidfuzz.distance import Levenshtein
 from tqdm import tqdm
 
 from src.logger import root_logger
-from src.utils.audio import trim_audio
-from src.utils.whisper_model import WhisperTimestampedASR
+from src.utils.audio import trim_audio_batch
+from src.utils.registry import models
 from src.paths import paths
 from dotenv import find_dotenv, load_dotenv
 
@@ -29,30 +28,65 @@ load_dotenv(find_dotenv(paths.PROJECT_ROOT_DIR / "secrets.env"), override=True)
 
 app_logger = root_logger.getChild("alignment_utils")
 
-
-def edit_distance(s1, s2):
-    return editdistance.eval(s1, s2)
+# sentences on each side of the expected one the segments are compared to, 0 compares to all
+ALIGNMENT_BAND = int(os.environ.get("ALIGNMENT_BAND", 50))
+# a segment is assigned to its closest sentence under this normalized edit distance
+MAX_ASSIGNED_DISTANCE = 0.25
+
+
+def distance_matrix(queries, choices, workers=-1):
+    # edit distance of every (query, choice) pair over the length of the shorter one,
+    # inf when either is empty. the matrix is computed in native code on all the cores
+    queries = [query if isinstance(query, str) else "" for query in queries]
+    choices = [choice if isinstance(choice, str) else "" for choice in choices]
+    distances = process.cdist(
+        queries, choices, scorer=Levenshtein.distance, dtype=np.int32, workers=workers
+    ).astype(np.float64)
+    lengths = np.minimum.outer(
+        np.array([len(query) for query in queries], dtype=np.float64),
+        np.array([len(choice) for choice in choices], dtype=np.float64),
+    )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        distances /= lengths
+    distances[lengths == 0] = np.inf
+    return distances
+
+
+def match_sentences(
+    queries, choices, band=ALIGNMENT_BAND, threshold=MAX_ASSIGNED_DISTANCE, workers=-1
+):
+    # best matching choice of every query and its distance, as in distance_matrix.
+    # a recording reads the choices in order, so with band > 0 a query is only
+    # compared to the choices within band of the previous match. the queries
+    # matching none of them (retakes, skipped lines) fall back to all the choices
+    if band <= 0:
+        distances = distance_matrix(queries, choices, workers=workers)
+        best_matches = np.argmin(distances, axis=1)
+        return best_matches, distances[np.arange(len(queries)), best_matches]
+
+    best_matches = np.zeros(len(queries), dtype=int)
+    best_distances = np.full(len(queries), np.inf)
+    anchor = 0
+    for i, query in enumerate(queries):
+        if not isinstance(query, str) or not query:
+            # inf against every choice, the full search would pick the first one too
+            continue
+        low, high = max(0, anchor - band), min(len(choices), anchor + band)
+        distances = distance_matrix([query], choices[low:high], workers=1)[0]
+        if high <= low or distances.min() >= threshold:
+            low = 0
+            distances = distance_matrix([query], choices, workers=workers)[0]
+        j = int(np.argmin(distances))
+        best_matches[i], best_distances[i] = low + j, distances[j]
+        if distances[j] < threshold:
+            anchor = low + j + 1
+    return best_matches, best_distances
 
 
 def format_int(i):
     return str(i).zfill(8)
 
 
-modelPyannote = Model.from_pretrained(
-    "pyannote/segmentation", use_auth_token=os.getenv("HUGGINGFACE_TOKEN")
-)
-
-pipeline = VoiceActivityDetection(segmentation=modelPyannote)
-HYPER_PARAMETERS = {
-    # onset/offset activation thresholds
-    "onset": 0.5,
-    "offset": 0.5,
-    # remove speech regions shorter than that many seconds.
-    "min_duration_on": 0.0,
-    # fill non-speech regions shorter than that many seconds.
-    "min_duration_off": 0.05,
-}
-pipeline.instantiate(HYPER_PARAMETERS)
 padding = 0.25
 
 
@@ -64,9 +98,17 @@ lang_map = {
     "it": "italian",
 }
 
-whisper_model = WhisperTimestampedASR(
-    model_size="medium", language="english", device="cuda"
-)
+
+def load_whisper_model():
+    # whisper imports torch, only import it when the alignment runs
+    from src.utils.whisper_model import WhisperTimestampedASR
+
+    return WhisperTimestampedASR(
+        model_size="medium", language="english", device="cuda"
+    )
+
+
+models.register("whisper", load_whisper_model)
 
 
 padding = 0.25
@@ -80,10 +122,12 @@ def align_wavs_whisper(
     start_id_regex: str,
     end_id_regex: str,
     assigned_only: bool = True,
+    band: int = ALIGNMENT_BAND,
 ) -> Tuple[str, str]:
     app_logger.info(
         f"Aligning wavs in {wavs_path} with csv file {csv_path} using Whisper for {language}"
     )
+    whisper_model = models.get("whisper")
     whisper_model.load(language=lang_map[language])
     app_logger.info(f"wav_path: {wavs_path}")
     filenames = glob(os.path.join(wavs_path, "*.wav"))
@@ -179,18 +223,10 @@ def align_wavs_whisper(
             print(f"Matching segments to sentences for {filename}")
             segments_list = [v for k, v in segments.items()]
             sentences_list = [v for k, v in sentences.items()]
-            distances_matrix = np.ones((len(segments_list), len(sentences_list))) * 1000
-            for ik in range(len(segments_list)):
-                for jk, sentence in enumerate(sentences_list):
-                    try:
-                        distances_matrix[ik, jk] = edit_distance(
-                            segments_list[ik]["asr"], sentence
-                        ) / min(len(segments_list[ik]["asr"]), len(sentence))
-                    except:
-                        distances_matrix[ik, jk] = np.inf
-
             # get the best match for each segment
-            best_matches = np.argmin(distances_matrix, axis=1)
+            best_matches, best_distances = match_sentences(
+                [segment["asr"] for segment in segments_list], sentences_list, band
+            )
             # # make a dataframe
             columns = [
                 "status",
@@ -210,7 +246,7 @@ def align_wavs_whisper(
             for ik in range(len(segments_list)):
                 asr = segments_list[ik]["asr"]
                 sentence = best_matched_sentences[ik]
-                ed_dist = distances_matrix[ik, best_matches[ik]]
+                ed_dist = best_distances[ik]
                 try:
                     len_dif = abs(len(asr) - len(sentence)) / min(
                         len(asr), len(sentence)
@@ -220,7 +256,7 @@ def align_wavs_whisper(
                 start = segments_list[ik]["SegmentStart"]
                 end = segments_list[ik]["SegmentEnd"]
                 sentenceNumber = inverseSentences[sentence]
-                if ed_dist < 0.25 and len_dif < 0.15:
+                if ed_dist < MAX_ASSIGNED_DISTANCE and len_dif < 0.15:
                     status = "assigned"
                 else:
                     status = "not_assigned"
@@ -275,21 +311,25 @@ def align_wavs_whisper(
                 "sentence_type",
             ]
             df_final = pd.DataFrame(columns=columns)
-            for index, row in tqdm(df.iterrows(), total=len(df)):
-                start = row["start"]
-                end = row["end"]
-                asr = row["asr"]
-                sentence = row["sentence"]
-                status = row["status"]
-                file_path = row["filename"]
+            # all the segments come from the same recording, cut them in one pass
+            trims = []
+            for index, row in df.iterrows():
                 filename = df_sentences.loc[row["sentenceNumber"]]["file_name"]
                 # filename = f"{language.upper()}" + format_int(row["sentenceNumber"]) + ".wav"
-                if status == "assigned":
+                if row["status"] == "assigned":
                     wav_path = os.path.join(output_wavs_dir, "assigned", filename)
                 else:
                     wav_path = os.path.join(output_wavs_dir, "not_assigned", filename)
+                trims.append((row["start"], row["end"], wav_path))
+            file_path = df["filename"].iloc[0] if len(df) > 0 else None
+            trimmed = trim_audio_batch(file_path, trims)
 
-                outpath, start, end = trim_audio(file_path, start, end, wav_path)
+            for (index, row), (outpath, start, end) in tqdm(
+                zip(df.iterrows(), trimmed), total=len(df)
+            ):
+                asr = row["asr"]
+                status = row["status"]
+                filename = df_sentences.loc[row["sentenceNumber"]]["file_name"]
                 # create a row for the csv file
                 myrow = {
                     "status": status,
@@ -343,10 +383,12 @@ def align_wavs_vad(
     start_id_regex: str,
     end_id_regex: str,
     assigned_only: bool = True,
+    band: int = ALIGNMENT_BAND,
 ) -> Tuple[str, str]:
     app_logger.info(
         f"Aligning wavs in {wavs_path} with csv file {csv_path} using VAD for {language}"
     )
+    whisper_model = models.get("whisper")
     whisper_model.load(language=lang_map[language])
     app_logger.info(f"wav_path: {wavs_path}")
 
@@ -372,7 +414,7 @@ def align_wavs_vad(
             else:
                 app_logger.info(f"Running VAD for {filename}")
                 try:
-                    vad = pipeline(filename)
+                    vad = models.get("vad")(filename)
                 except Exception as e:
                     app_logger.error(f"Failed to run VAD for {filename}")
                     app_logger.error(e)
@@ -458,18 +500,10 @@ def align_wavs_vad(
             print(f"Matching segments to sentences for {filename}")
             segments_list = [v for k, v in segments.items()]
             sentences_list = [v for k, v in sentences.items()]
-            distances_matrix = np.ones((len(segments_list), len(sentences_list))) * 1000
-            for ik in range(len(segments_list)):
-                for jk, sentence in enumerate(sentences_list):
-                    try:
-                        distances_matrix[ik, jk] = edit_distance(
-                            segments_list[ik]["asr"], sentence
-                        ) / min(len(segments_list[ik]["asr"]), len(sentence))
-                    except:
-                        distances_matrix[ik, jk] = np.inf
-
             # get the best match for each segment
-            best_matches = np.argmin(distances_matrix, axis=1)
+            best_matches, best_distances = match_sentences(
+                [segment["asr"] for segment in segments_list], sentences_list, band
+            )
             # # make a dataframe
             columns = [
                 "status",
@@ -489,7 +523,7 @@ def align_wavs_vad(
             for ik in range(len(segments_list)):
                 asr = segments_list[ik]["asr"]
                 sentence = best_matched_sentences[ik]
-                ed_dist = distances_matrix[ik, best_matches[ik]]
+                ed_dist = best_distances[ik]
                 try:
                     len_dif = abs(len(asr) - len(sentence)) / min(
                         len(asr), len(sentence)
@@ -499,7 +533,7 @@ def align_wavs_vad(
                 start = segments_list[ik]["SegmentStart"]
                 end = segments_list[ik]["SegmentEnd"]
                 sentenceNumber = inverseSentences[sentence]
-                if ed_dist < 0.25 and len_dif < 0.15:
+                if ed_dist < MAX_ASSIGNED_DISTANCE and len_dif < 0.15:
                     status = "assigned"
                 else:
                     status = "not_assigned"
@@ -554,21 +588,25 @@ def align_wavs_vad(
                 "sentence_type",
             ]
             df_final = pd.DataFrame(columns=columns)
-            for index, row in tqdm(df.iterrows(), total=len(df)):
-                start = row["start"]
-                end = row["end"]
-                asr = row["asr"]
-                sentence = row["sentence"]
-                status = row["status"]
-                file_path = row["filename"]
+            # all the segments come from the same recording, cut them in one pass
+            trims = []
+            for index, row in df.iterrows():
                 filename = df_sentences.loc[row["sentenceNumber"]]["file_name"]
                 # filename = f"{language.upper()}" + format_int(row["sentenceNumber"]) + ".wav"
-                if status == "assigned":
+                if row["status"] == "assigned":
                     wav_path = os.path.join(output_wavs_dir, "assigned", filename)
                 else:
                     wav_path = os.path.join(output_wavs_dir, "not_assigned", filename)
+                trims.append((row["start"], row["end"], wav_path))
+            file_path = df["filename"].iloc[0] if len(df) > 0 else None
+            trimmed = trim_audio_batch(file_path, trims)
 
-                outpath, start, end = trim_audio(file_path, start, end, wav_path)
+            for (index, row), (outpath, start, end) in tqdm(
+                zip(df.iterrows(), trimmed), total=len(df)
+            ):
+                asr = row["asr"]
+                status = row["status"]
+                filename = df_sentences.loc[row["sentenceNumber"]]["file_name"]
                 # create a row for the csv file
                 myrow = {
                     "status": status,
@@ -0,0 +1,156 @@
+"""Persistent cache of the ASR results.
+
+The remote ASR services are paid per call, and re-running the backfill or switching provider used to send the same
+audio again. An entry is keyed by the sha256 of the audio, the provider, the model id and the language, and holds the
+segment details returned by the model, so the transcription, pauses and trim times can be recomputed offline.
+The entries live in a SQLite database next to the audio cache. They expire after ASR_CACHE_TTL_DAYS and the least
+recently used ones are evicted once the database holds more than ASR_CACHE_MAX_MB of details, 0 disables the cache.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Optional
+
+from src.logger import root_logger
+from src.paths import paths
+
+
+app_logger = root_logger.getChild("asr_cache")
+
+DB_PATH = paths.LOCAL_BUCKET_DIR / ".cache" / "asr.sqlite"
+TTL_SEC = float(os.environ.get("ASR_CACHE_TTL_DAYS", 90)) * 24 * 3600
+MAX_BYTES = float(os.environ.get("ASR_CACHE_MAX_MB", 512)) * 1024**2
+
+_local = threading.local()
+_lock = threading.Lock()
+# size of the cached details, summed on the first store
+_size: Optional[int] = None
+
+schema = """
+CREATE TABLE IF NOT EXISTS asr_result (
+    sha256 TEXT NOT NULL,
+    provider TEXT NOT NULL,
+    model_id TEXT NOT NULL,
+    language TEXT NOT NULL,
+    details TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    PRIMARY KEY (sha256, provider, model_id, language)
+);
+CREATE INDEX IF NOT EXISTS ix_asr_result_accessed_at ON asr_result (accessed_at);
+"""
+
+
+def enabled() -> bool:
+    return MAX_BYTES > 0
+
+
+def _connection() -> sqlite3.Connection:
+    # sqlite connections can not be shared across threads, every thread opens its own
+    if getattr(_local, "connection", None) is None:
+        os.makedirs(DB_PATH.parent, exist_ok=True)
+        connection = sqlite3.connect(DB_PATH, timeout=30, isolation_level=None)
+        # readers do not block the writer, several backfill processes can share the cache
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript(schema)
+        _local.connection = connection
+    return _local.connection
+
+
+def fetch(sha256: str, provider: str, model_id: str, language: str) -> Optional[Any]:
+    """Get the cached details of an ASR request.
+
+    Args:
+        sha256 (str): The sha256 of the audio, see audio_cache.content_hash.
+        provider (str): The provider of the model.
+        model_id (str): The id of the model.
+        language (str): The language of the audio.
+
+    Returns:
+        Optional[Any]: The details returned by the model, None on a miss or an expired entry.
+    """
+    if not enabled():
+        return None
+    key = (sha256, provider, model_id, language)
+    try:
+        connection = _connection()
+        row = connection.execute(
+            "SELECT details, created_at FROM asr_result WHERE sha256 = ? AND provider = ? AND model_id = ? AND language = ?", key
+        ).fetchone()
+        if row is None:
+            return None
+        if row[1] < time.time() - TTL_SEC:
+            connection.execute("DELETE FROM asr_result WHERE sha256 = ? AND provider = ? AND model_id = ? AND language = ?", key)
+            return None
+        connection.execute(
+            "UPDATE asr_result SET accessed_at = ? WHERE sha256 = ? AND provider = ? AND model_id = ? AND language = ?", (time.time(), *key)
+        )
+        app_logger.debug(f"Cache hit {provider} {model_id} {language} {sha256}")
+        return json.loads(row[0])
+    except sqlite3.Error as e:
+        app_logger.warning(f"Failed to read the asr cache: {e}")
+        return None
+
+
+def store(sha256: str, provider: str, model_id: str, language: str, details: Any) -> None:
+    """Add the details of an ASR request to the cache, evicting the least recently used entries if the cache is full.
+
+    Args:
+        sha256 (str): The sha256 of the audio, see audio_cache.content_hash.
+        provider (str): The provider of the model.
+        model_id (str): The id of the model.
+        language (str): The language of the audio.
+        details (Any): The details returned by the model, must be json serializable.
+    """
+    global _size
+    if not enabled():
+        return
+    serialized = json.dumps(details, default=str)
+    now = time.time()
+    try:
+        connection = _connection()
+        connection.execute(
+            "INSERT OR REPLACE INTO asr_result VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (sha256, provider, model_id, language, serialized, len(serialized), now, now),
+        )
+        with _lock:
+            if _size is None:
+                _size = connection.execute("SELECT COALESCE(SUM(size), 0) FROM asr_result").fetchone()[0]
+            else:
+                _size += len(serialized)
+            if _size > MAX_BYTES:
+                _size = evict(int(MAX_BYTES * 0.9))
+    except sqlite3.Error as e:
+        app_logger.warning(f"Failed to store in the asr cache: {e}")
+
+
+def evict(max_bytes: int) -> int:
+    """Remove the expired entries, then the least recently used ones until the cache fits in max_bytes.
+
+    Args:
+        max_bytes (int): The target size of the cached details.
+
+    Returns:
+        int: The size of the cached details after eviction.
+    """
+    connection = _connection()
+    connection.execute("DELETE FROM asr_result WHERE created_at < ?", (time.time() - TTL_SEC,))
+    size = connection.execute("SELECT COALESCE(SUM(size), 0) FROM asr_result").fetchone()[0]
+    if size > max_bytes:
+        # the newest entries that fit in max_bytes are kept
+        connection.execute(
+            """
+            DELETE FROM asr_result WHERE rowid IN (
+                SELECT rowid FROM (
+                    SELECT rowid, SUM(size) OVER (ORDER BY accessed_at DESC, rowid DESC) AS kept FROM asr_result
+                ) WHERE kept > ?
+            )
+            """,
+            (max_bytes,),
+        )
+        size = connection.execute("SELECT COALESCE(SUM(size), 0) FROM asr_result").fetchone()[0]
+    app_logger.info(f"Evicted the asr cache down to {size / 1024**2:.2f} MB")
+    return size
@@ -0,0 +1,290 @@
+"""Asynchronous client of the aiXplain ASR models.
+
+model.run() of the aiXplain SDK blocks a thread for the whole request and polling, so the throughput of the backfill
+was bound by the number of threads. ASRClient runs the requests on an event loop in a background thread instead, over
+one pooled http session. The jobs in flight are limited per provider to stay within its quota, and the failures are
+retried with jittered exponential backoff before surfacing as an ASRError.
+
+ASRBackend holds that machinery and leaves the request itself to its subclasses. ASR_BACKEND selects the backend of
+the process: "aixplain" for ASRClient or "fake" for FakeASRBackend, a deterministic local stand-in with configurable
+latency and failure rate, to benchmark and load test the pipeline without the network.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import random
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import Future
+from typing import Dict, Iterable, List, Optional, Union
+
+import aiohttp
+
+from src.logger import root_logger
+
+
+app_logger = root_logger.getChild("asr_client")
+
+MODELS_RUN_URL = os.environ.get("MODELS_RUN_URL", "https://models.aixplain.com/api/v1/execute")
+# jobs in flight per provider, attempts per job, backoff base and cap, and the time a job has to complete
+ASR_CONCURRENCY = {
+    "azure": int(os.environ.get("ASR_CONCURRENCY_AZURE", 16)),
+    "aws": int(os.environ.get("ASR_CONCURRENCY_AWS", 16)),
+}
+ASR_MAX_ATTEMPTS = int(os.environ.get("ASR_MAX_ATTEMPTS", 5))
+ASR_BACKOFF_SEC = float(os.environ.get("ASR_BACKOFF_SEC", 1))
+ASR_MAX_BACKOFF_SEC = float(os.environ.get("ASR_MAX_BACKOFF_SEC", 30))
+ASR_TIMEOUT_SEC = float(os.environ.get("ASR_TIMEOUT_SEC", 300))
+ASR_BACKEND = os.environ.get("ASR_BACKEND", "aixplain")
+# fake backend: mean latency of a job, its relative jitter and the fraction of the attempts failing
+ASR_FAKE_LATENCY_MS = float(os.environ.get("ASR_FAKE_LATENCY_MS", 2000))
+ASR_FAKE_JITTER = float(os.environ.get("ASR_FAKE_JITTER", 0.5))
+ASR_FAKE_FAILURE_RATE = float(os.environ.get("ASR_FAKE_FAILURE_RATE", 0.0))
+
+
+class ASRError(Exception):
+    """A failed ASR request, retryable ones are only raised once the attempts are exhausted."""
+
+    retryable = False
+
+    def __init__(self, message: str, provider: str = None, data: str = None):
+        super().__init__(message)
+        self.provider = provider
+        self.data = data
+
+
+class ASRRateLimitError(ASRError):
+    retryable = True
+
+    def __init__(self, message: str, retry_after: Optional[float] = None, **kwargs):
+        super().__init__(message, **kwargs)
+        self.retry_after = retry_after
+
+
+class ASRUnavailableError(ASRError):
+    # network errors and 5xx responses
+    retryable = True
+
+
+class ASRTimeoutError(ASRError):
+    retryable = True
+
+
+class ASRRequestError(ASRError):
+    # 4xx responses other than 429, e.g. a wrong api key or model id
+    pass
+
+
+class ASRModelError(ASRError):
+    # the job completed without a transcription, e.g. an unreadable audio file
+    pass
+
+
+def backoff(attempt: int, base: float = ASR_BACKOFF_SEC, cap: float = ASR_MAX_BACKOFF_SEC) -> float:
+    # full jitter, so the requests failing together are not retried together
+    return random.uniform(0, min(cap, base * 2**attempt))
+
+
+class ASRBackend(ABC):
+    """Runs ASR jobs from any thread on an event loop of its own.
+
+    submit returns a concurrent Future and run blocks on it, run_many transcribes many files with at most the
+    concurrency of the provider in flight. Subclasses implement _run_job, a single attempt of a job.
+    """
+
+    # whether the results are worth keeping in the asr cache
+    cached = False
+
+    def __init__(self, concurrency: Dict[str, int] = None, max_attempts: int = ASR_MAX_ATTEMPTS, timeout: float = ASR_TIMEOUT_SEC):
+        self.concurrency = dict(ASR_CONCURRENCY, **(concurrency or {}))
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="asr-client", daemon=True)
+        self._thread.start()
+        # created on the loop, they are bound to it
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    def submit(self, provider: str, model_id: str, data: str) -> Future:
+        """Queue an ASR job.
+
+        Args:
+            provider (str): The provider of the model, the key of its concurrency limit.
+            model_id (str): The aiXplain id of the model.
+            data (str): The audio, usually an s3 path.
+
+        Returns:
+            Future: Resolves to the details of the transcription or raises an ASRError.
+        """
+        return asyncio.run_coroutine_threadsafe(self.transcribe(provider, model_id, data), self._loop)
+
+    def run(self, provider: str, model_id: str, data: str):
+        return self.submit(provider, model_id, data).result()
+
+    def run_many(self, provider: str, model_id: str, data: Iterable[str]) -> List[Union[dict, list, ASRError]]:
+        """Transcribe many files, the failures are returned in place of their transcription.
+
+        Args:
+            provider (str): The provider of the model.
+            model_id (str): The aiXplain id of the model.
+            data (Iterable[str]): The audio files.
+
+        Returns:
+            List[Union[dict, list, ASRError]]: The details of the transcription or the error of each file.
+        """
+        futures = [self.submit(provider, model_id, item) for item in data]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except ASRError as e:
+                results.append(e)
+        return results
+
+    def close(self) -> None:
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+    async def transcribe(self, provider: str, model_id: str, data: str):
+        if provider not in self._semaphores:
+            self._semaphores[provider] = asyncio.Semaphore(self.concurrency.get(provider, 8))
+        for attempt in range(self.max_attempts):
+            # a slot of the provider is only held during an attempt, not during the backoff before the next one
+            try:
+                async with self._semaphores[provider]:
+                    return await asyncio.wait_for(self._run_job(provider, model_id, data), self.timeout)
+            except asyncio.TimeoutError:
+                error = ASRTimeoutError(f"No transcription in {self.timeout} seconds", provider=provider, data=data)
+            except aiohttp.ClientError as e:
+                error = ASRUnavailableError(str(e), provider=provider, data=data)
+            except ASRError as e:
+                error = e
+            if not error.retryable or attempt == self.max_attempts - 1:
+                raise error
+            delay = backoff(attempt)
+            if isinstance(error, ASRRateLimitError) and error.retry_after:
+                delay = max(delay, error.retry_after)
+            app_logger.warning(f"ASR of {data} failed (attempt {attempt + 1}/{self.max_attempts}), retrying in {delay:.1f}s: {error}")
+            await asyncio.sleep(delay)
+
+    @abstractmethod
+    async def _run_job(self, provider: str, model_id: str, data: str):
+        """Run a single attempt of an ASR job.
+
+        Args:
+            provider (str): The provider of the model.
+            model_id (str): The id of the model.
+            data (str): The audio, usually an s3 path.
+
+        Returns:
+            The details of the transcription, raises an ASRError on failure.
+        """
+
+
+class ASRClient(ASRBackend):
+    """Runs ASR jobs on the aiXplain models, over one pooled http session."""
+
+    cached = True
+
+    def __init__(self, api_key: str = None, run_url: str = MODELS_RUN_URL, **kwargs):
+        super().__init__(**kwargs)
+        self.api_key = api_key or os.environ.get("TEAM_API_KEY", "")
+        self.run_url = run_url
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def close(self) -> None:
+        if self._session is not None:
+            asyncio.run_coroutine_threadsafe(self._session.close(), self._loop).result()
+        super().close()
+
+    async def _run_job(self, provider: str, model_id: str, data: str):
+        # the model runs asynchronously on the platform: start the job, then poll its url until it completes
+        response = await self._request("post", f"{self.run_url}/{model_id}", provider, data, json={"data": data})
+        poll_url = response["data"]
+        wait_time = 1.0
+        while True:
+            await asyncio.sleep(wait_time)
+            response = await self._request("get", poll_url, provider, data)
+            if response.get("completed"):
+                if response.get("status") == "FAILED" or response.get("error") or "details" not in response:
+                    raise ASRModelError(str(response.get("error") or response), provider=provider, data=data)
+                return response["details"]
+            wait_time = min(wait_time * 1.1, 10)
+
+    async def _request(self, method: str, url: str, provider: str, data: str, **kwargs) -> dict:
+        if self._session is None:
+            connector = aiohttp.TCPConnector(limit=sum(self.concurrency.values()), ttl_dns_cache=300)
+            self._session = aiohttp.ClientSession(connector=connector, headers={"x-api-key": self.api_key, "Content-Type": "application/json"})
+        async with self._session.request(method, url, **kwargs) as r:
+            body = await r.text()
+            if r.status == 429:
+                retry_after = r.headers.get("Retry-After")
+                raise ASRRateLimitError(body, retry_after=float(retry_after) if retry_after and retry_after.isdigit() else None, provider=provider, data=data)
+            if r.status >= 500:
+                raise ASRUnavailableError(f"{r.status}: {body}", provider=provider, data=data)
+            if r.status >= 400:
+                raise ASRRequestError(f"{r.status}: {body}", provider=provider, data=data)
+            try:
+                return json.loads(body)
+            except ValueError:
+                raise ASRUnavailableError(f"Invalid response: {body[:200]}", provider=provider, data=data)
+
+
+class FakeASRBackend(ASRBackend):
+    """Deterministic local stand-in of the aiXplain ASR models.
+
+    The transcription, latency and failures of a job only depend on the seed, its input and the attempt, so runs are
+    reproducible. The details have the shape of the ones of the provider, segments of synthetic words.
+    """
+
+    words = ["alpha", "bravo", "charlie", "delta", "echo", "foxtrot", "golf", "hotel", "india", "juliet", "kilo", "lima"]
+
+    def __init__(
+        self,
+        latency_ms: float = ASR_FAKE_LATENCY_MS,
+        jitter: float = ASR_FAKE_JITTER,
+        failure_rate: float = ASR_FAKE_FAILURE_RATE,
+        seed: int = 0,
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        self.latency = latency_ms / 1000
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.seed = seed
+        self._attempts: Dict[tuple, int] = {}
+
+    def _random(self, *key) -> random.Random:
+        return random.Random(hashlib.sha256(json.dumps([self.seed, *key]).encode()).hexdigest())
+
+    async def _run_job(self, provider: str, model_id: str, data: str):
+        attempt = self._attempts.get((provider, model_id, data), 0)
+        self._attempts[(provider, model_id, data)] = attempt + 1
+        rng = self._random(provider, model_id, data, attempt)
+        await asyncio.sleep(max(0.0, rng.gauss(self.latency, self.latency * self.jitter)))
+        if rng.random() < self.failure_rate:
+            raise rng.choice([ASRRateLimitError, ASRUnavailableError])("Fake failure", provider=provider, data=data)
+        return self.details(provider, model_id, data)
+
+    def details(self, provider: str, model_id: str, data: str):
+        # the transcription of an input is the same on every attempt
+        rng = self._random(provider, model_id, data)
+        segments, start = [], rng.uniform(0.1, 0.5)
+        for _ in range(rng.randint(1, 4)):
+            duration = rng.uniform(0.5, 3.0)
+            text = " ".join(rng.choice(self.words) for _ in range(max(1, int(duration * 2.5))))
+            segments.append({"text": text, "start_time": round(start, 2), "end_time": round(start + duration, 2)})
+            start += duration + rng.uniform(0.05, 0.6)
+        return {"segments": segments} if provider == "aws" else segments
+
+
+def load_asr_backend(backend: str = None) -> ASRBackend:
+    backend = backend or ASR_BACKEND
+    if backend == "aixplain":
+        return ASRClient()
+    if backend == "fake":
+        app_logger.warning("Using the fake ASR backend, the transcriptions are synthetic")
+        return FakeASRBackend()
+    raise ValueError(f"Unknown ASR backend {backend}, expected aixplain or fake")
@@ -5,22 +5,21 @@ from dotenv import find_dotenv, load_dotenv
 load_dotenv(find_dotenv(paths.PROJECT_ROOT_DIR / "vars.env"), override=True)
 load_dotenv(find_dotenv(paths.PROJECT_ROOT_DIR / "secrets.env"), override=True)
 
-import time
+import struct
+from concurrent.futures import Future
 
-import librosa
+import numpy as np
 import pandas as pd
 import soundfile as sf
-from aixplain.factories.model_factory import ModelFactory
-from pyannote.audio import Model
-from pyannote.audio.pipelines import VoiceActivityDetection
 from pydub import AudioSegment
 from pydub.utils import mediainfo
 
+from src.utils import asr_cache, audio_cache
+from src.utils.asr_client import ASRError, load_asr_backend
+from src.utils.registry import models
 
-modelPyannote = Model.from_pretrained(
-    "pyannote/segmentation", use_auth_token=os.getenv("HUGGINGFACE_TOKEN")
-)
-vad_pipeline = VoiceActivityDetection(segmentation=modelPyannote)
+
+# librosa and pyannote are imported where they are used, importing them takes seconds and the api does not need them
 HYPER_PARAMETERS = {
     # onset/offset activation thresholds
     "onset": 0.5,
@@ -30,103 +29,134 @@ HYPER_PARAMETERS = {
     # fill non-speech regions shorter than that many seconds.
     "min_duration_off": 0.05,
 }
-vad_pipeline.instantiate(HYPER_PARAMETERS)
+
+
+def load_segmentation_model():
+    from pyannote.audio import Model
+
+    return Model.from_pretrained("pyannote/segmentation", use_auth_token=os.getenv("HUGGINGFACE_TOKEN"))
+
+
+def load_vad_pipeline():
+    from pyannote.audio.pipelines import VoiceActivityDetection
+
+    vad_pipeline = VoiceActivityDetection(segmentation=models.get("segmentation"))
+    vad_pipeline.instantiate(HYPER_PARAMETERS)
+    return vad_pipeline
+
+
+def load_batched_vad():
+    from src.utils.vad import BatchedVAD
+
+    return BatchedVAD(models.get("segmentation"), **HYPER_PARAMETERS)
 
 
 api_keys_azure = {
-    "en": {
-        "id": "62fab6ecb39cca09ca5bc378",
-        "model": ModelFactory.create_asset_from_id("62fab6ecb39cca09ca5bc378"),
-    },
-    "es": {
-        "id": "62fab6ecb39cca09ca5bc375",
-        "model": ModelFactory.create_asset_from_id("62fab6ecb39cca09ca5bc375"),
-    },
-    "fr": {
-        "id": "62fab6ecb39cca09ca5bc389",
-        "model": ModelFactory.create_asset_from_id("62fab6ecb39cca09ca5bc389"),
-    },
-    "it": {
-        "id": "62fab6ecb39cca09ca5bc353",
-        "model": ModelFactory.create_asset_from_id("62fab6ecb39cca09ca5bc353"),
-    },
-    "de": {
-        "id": "62fab6ecb39cca09ca5bc334",
-        "model": ModelFactory.create_asset_from_id("62fab6ecb39cca09ca5bc334"),
-    },
+    "en": {"id": "62fab6ecb39cca09ca5bc378"},
+    "es": {"id": "62fab6ecb39cca09ca5bc375"},
+    "fr": {"id": "62fab6ecb39cca09ca5bc389"},
+    "it": {"id": "62fab6ecb39cca09ca5bc353"},
+    "de": {"id": "62fab6ecb39cca09ca5bc334"},
 }
 
 
 api_keys_aws = {
-    "en": {
-        "id": "60ddef908d38c51c5885dd1e",
-        "model": ModelFactory.create_asset_from_id("60ddef908d38c51c5885dd1e"),
-    },
-    "es": {
-        "id": "60ddefd68d38c51c588608c6",
-        "model": ModelFactory.create_asset_from_id("60ddefd68d38c51c588608c6"),
-    },
-    "fr": {
-        "id": "60ddefde8d38c51c58860d8d",
-        "model": ModelFactory.create_asset_from_id("60ddefde8d38c51c58860d8d"),
-    },
-    "it": {
-        "id": "60ddefa38d38c51c5885e979",
-        "model": ModelFactory.create_asset_from_id("60ddefa38d38c51c5885e979"),
-    },
-    "de": {
-        "id": "60ddefc48d38c51c5885fd69",
-        "model": ModelFactory.create_asset_from_id("60ddefc48d38c51c5885fd69"),
-    },
+    "en": {"id": "60ddef908d38c51c5885dd1e"},
+    "es": {"id": "60ddefd68d38c51c588608c6"},
+    "fr": {"id": "60ddefde8d38c51c58860d8d"},
+    "it": {"id": "60ddefa38d38c51c5885e979"},
+    "de": {"id": "60ddefc48d38c51c5885fd69"},
 }
 
 
-def asr_and_trim_azure(s3path, language="en"):
-    model = api_keys_azure[language]["model"]
-    response = {}
-    count = 0
-    while count < 3 and response == {}:
+models.register("segmentation", load_segmentation_model)
+models.register("vad", load_vad_pipeline)
+# the pipeline above runs one file per call, trim_only goes through the batched one so that concurrent callers share batches
+models.register("batched_vad", load_batched_vad)
+# one client, its http session and concurrency limits are shared by all the asr calls of the process.
+# ASR_BACKEND=fake swaps it for the local stand-in
+models.register("asr_client", load_asr_backend)
+
+
+asr_model_ids = {"azure": api_keys_azure, "aws": api_keys_aws}
+
+
+def submit_asr(provider, s3path, language="en", local_path=None):
+    # queue the asr of an audio on the client's event loop, the future resolves to the details of the model or raises
+    # an ASRError. given the local copy of the audio, the details are cached under its content hash
+    client = models.get("asr_client")
+    model_id = asr_model_ids[provider][language]["id"]
+    if local_path is None or not client.cached or not asr_cache.enabled():
+        return client.submit(provider, model_id, s3path)
+    key = (audio_cache.content_hash(local_path), provider, model_id, language)
+    details = asr_cache.fetch(*key)
+    if details is not None:
+        future = Future()
+        future.set_result(details)
+        return future
+    future = Future()
+
+    def cache_and_resolve(request):
+        # the details are stored before the future resolves, a caller that got them always finds them in the cache
+        if request.exception() is not None:
+            future.set_exception(request.exception())
+            return
         try:
-            model_response = model.run(data=s3path, name=f"ASR model ({language})")
-            if model_response["status"] == "SUCCESS":
-                details = model_response["details"]
-
-                df_details = pd.DataFrame(details)
-                df_details.head()
-
-                df_details["pauses"] = (
-                    df_details["start_time"].shift(-1) - df_details["end_time"]
-                )
-                df_details["pauses"] = df_details["pauses"].fillna(0)
-                transcription = " ".join(df_details["text"])
-
-                start_time = df_details.loc[0, "start_time"]
-                end_time = df_details.loc[len(df_details) - 1, "end_time"]
-                audio_duration = end_time - start_time
-
-                response["asr_text"] = transcription
-                response["trim_start"] = start_time
-                response["trim_end"] = end_time
-                response["trimmed_audio_duration"] = audio_duration
-                response["longest_pause"] = df_details["pauses"].max()
-                return response
-        except Exception as e:
-            print(e)
-            count += 1
-            time.sleep(1)
-            continue
+            asr_cache.store(*key, request.result())
+        finally:
+            future.set_result(request.result())
+
+    client.submit(provider, model_id, s3path).add_done_callback(cache_and_resolve)
+    return future
+
+
+def run_asr(provider, s3path, language="en", local_path=None):
+    return submit_asr(provider, s3path, language, local_path).result()
+
+
+EMPTY_TRIM_RESPONSE = {
+    "asr_text": "",
+    "trim_start": 0,
+    "trim_end": 0,
+    "trimmed_audio_duration": 0,
+    "longest_pause": 0,
+}
+
+
+def trim_response(df_details):
+    if df_details.empty:
+        return dict(EMPTY_TRIM_RESPONSE)
+    df_details["pauses"] = (
+        df_details["start_time"].shift(-1) - df_details["end_time"]
+    )
+    df_details["pauses"] = df_details["pauses"].fillna(0)
+    start_time = df_details["start_time"].values[0]
+    end_time = df_details["end_time"].values[-1]
     return {
-        "asr_text": "",
-        "trim_start": 0,
-        "trim_end": 0,
-        "trimmed_audio_duration": 0,
-        "longest_pause": 0,
+        "asr_text": " ".join(df_details["text"]),
+        "trim_start": start_time,
+        "trim_end": end_time,
+        "trimmed_audio_duration": end_time - start_time,
+        "longest_pause": df_details["pauses"].max(),
     }
 
 
-def trim_only(path):
-    vad = vad_pipeline(path)
-    timeline = vad.get_timeline().support()
+# the asr functions return an empty transcription on failure, strict=True raises the ASRError instead
+def asr_and_trim_azure(s3path, language="en", strict=False, local_path=None):
+    try:
+        details = run_asr("azure", s3path, language, local_path)
+        return trim_response(pd.DataFrame(details))
+    except ASRError as e:
+        if strict:
+            raise
+        print(e)
+        return dict(EMPTY_TRIM_RESPONSE)
+
+
+# the speech timeline of the file is computed unless given, e.g. by a BatchedVAD.run over a batch of files
+def trim_only(path, timeline=None):
+    if timeline is None:
+        timeline = models.get("batched_vad")(path)
     longest_pause = 0
     previous_end = 0
     # for timelines that has diff lover than 0.2 sec remove segment
@@ -150,6 +180,8 @@ def trim_only(path):
         audio_duration = end_time - start_time
     except:
         print(f"Error in audio duration calculation, do not triming file {path}")
+        import librosa
+
         # get audio dur in secs
         audio_duration = librosa.get_duration(filename=path)
         end_time = audio_duration
@@ -163,73 +195,125 @@ def trim_only(path):
     }
 
 
-def asr_aws(s3path, language="en"):
-    model = api_keys_aws[language]["model"]
-    response = {}
-    count = 0
-    while count < 3 and response == {}:
-        try:
-            model_response = model.run(data=s3path, name=f"ASR model ({language})")
-            if model_response["status"] == "SUCCESS":
-                details = model_response["details"]["segments"]
+def aws_transcription(details):
+    df_details = pd.DataFrame(details["segments"])
+    df_details.dropna(inplace=True)
+    return " ".join(df_details["text"])
+
+
+def asr_aws(s3path, language="en", strict=False, local_path=None):
+    try:
+        details = run_asr("aws", s3path, language, local_path)
+        return aws_transcription(details)
+    except ASRError as e:
+        if strict:
+            raise
+        print(e)
+        return ""
 
-                df_details = pd.DataFrame(details)
-                df_details.dropna(inplace=True)
 
-                transcription = " ".join(df_details["text"])
-                return transcription
-        except Exception as e:
-            print(e)
-            count += 1
-            time.sleep(1)
-            continue
-    return ""
+def asr_and_trim_aws(s3path, language="en", strict=False, local_path=None):
+    try:
+        details = run_asr("aws", s3path, language, local_path)
+        df_details = pd.DataFrame(details["segments"])
+        df_details.dropna(inplace=True)
+        return trim_response(df_details)
+    except ASRError as e:
+        if strict:
+            raise
+        print(e)
+        return dict(EMPTY_TRIM_RESPONSE)
+
+
+# sample format and codec names as reported by ffprobe, for the pcm encodings the fast path of evaluate_audio reads
+WAV_PCM_FORMATS = {
+    (1, 8): ("u8", "pcm_u8", np.uint8),
+    (1, 16): ("s16", "pcm_s16le", np.int16),
+    (1, 32): ("s32", "pcm_s32le", np.int32),
+    (3, 32): ("flt", "pcm_f32le", np.float32),
+}
 
 
-def asr_and_trim_aws(s3path, language="en"):
-    model = api_keys_aws[language]["model"]
+# parse the RIFF header of a wav file, returns None if it is not a wav file with one of WAV_PCM_FORMATS
+def read_wav_header(path):
+    with open(path, "rb") as f:
+        riff = f.read(12)
+        if len(riff) < 12 or riff[:4] != b"RIFF" or riff[8:12] != b"WAVE":
+            return None
+        header = {}
+        while True:
+            chunk = f.read(8)
+            if len(chunk) < 8:
+                return None
+            chunk_id, chunk_size = chunk[:4], struct.unpack("<I", chunk[4:])[0]
+            if chunk_id == b"fmt ":
+                fmt = f.read(chunk_size)
+                format_tag, n_channel, sampling_rate, _, _, bits = struct.unpack("<HHIIHH", fmt[:16])
+                # WAVE_FORMAT_EXTENSIBLE, the actual format is the first two bytes of the sub format guid
+                if format_tag == 0xFFFE and len(fmt) >= 26:
+                    format_tag = struct.unpack("<H", fmt[24:26])[0]
+                header.update(format_tag=format_tag, n_channel=n_channel, sampling_rate=sampling_rate, bits=bits)
+                f.seek(chunk_size % 2, 1)
+            elif chunk_id == b"data":
+                if "format_tag" not in header:
+                    return None
+                header["data_offset"] = f.tell()
+                # the size of streamed wavs is not always filled in
+                header["data_size"] = min(chunk_size, os.path.getsize(path) - header["data_offset"])
+                break
+            else:
+                f.seek(chunk_size + chunk_size % 2, 1)
+    if (header["format_tag"], header["bits"]) not in WAV_PCM_FORMATS or header["n_channel"] == 0:
+        return None
+    return header
+
+
+# evaluate a pcm wav file without spawning ffprobe and ffmpeg: the format comes from the header and the peak from a
+# memory mapped view of the samples. returns None if the file is not a pcm wav file
+def evaluate_wav(path):
+    header = read_wav_header(path)
+    if header is None:
+        return None
+    sample_format, codec, dtype = WAV_PCM_FORMATS[(header["format_tag"], header["bits"])]
+    n_frames = header["data_size"] // (header["n_channel"] * header["bits"] // 8)
+    if n_frames > 0:
+        samples = np.memmap(path, dtype=np.dtype(dtype).newbyteorder("<"), mode="r", offset=header["data_offset"], shape=(n_frames * header["n_channel"],))
+        if dtype == np.uint8:
+            peak, full_scale = max(int(samples.max()) - 128, 128 - int(samples.min())), 128
+        elif dtype == np.float32:
+            peak, full_scale = float(max(samples.max(), -samples.min())), 1.0
+        else:
+            peak, full_scale = max(int(samples.max()), -int(samples.min())), 2 ** (header["bits"] - 1)
+        del samples
+    else:
+        peak, full_scale = 0, 1
     response = {}
-    count = 0
-    while count < 3 and response == {}:
-        try:
-            model_response = model.run(data=s3path, name=f"ASR model ({language})")
-            if model_response["status"] == "SUCCESS":
-                details = model_response["details"]["segments"]
-
-                df_details = pd.DataFrame(details)
-                df_details.dropna(inplace=True)
-
-                df_details["pauses"] = (
-                    df_details["start_time"].shift(-1) - df_details["end_time"]
-                )
-                df_details["pauses"] = df_details["pauses"].fillna(0)
-                transcription = " ".join(df_details["text"])
-
-                start_time = df_details["start_time"].values[0]
-                end_time = df_details["end_time"].values[-1]
-                audio_duration = end_time - start_time
-
-                response["asr_text"] = transcription
-                response["trim_start"] = start_time
-                response["trim_end"] = end_time
-                response["trimmed_audio_duration"] = audio_duration
-                response["longest_pause"] = df_details["pauses"].max()
-                return response
-        except Exception as e:
-            print(e)
-            count += 1
-            time.sleep(1)
-            continue
-    return {
-        "asr_text": "",
-        "trim_start": 0,
-        "trim_end": 0,
-        "trimmed_audio_duration": 0,
-        "longest_pause": 0,
-    }
+    response["Filepath"] = path
+    response["file_type"] = os.path.splitext(path)[1]
+    response["file_name"] = os.path.basename(path)
+    response["sampling_rate"] = header["sampling_rate"]
+    response["sample_format"] = sample_format
+    response["format"] = "wav"
+    response["n_channel"] = header["n_channel"]
+    response["bit_rate"] = header["sampling_rate"] * header["n_channel"] * header["bits"]
+    response["codec"] = codec
+    # same as pydub max_dBFS
+    response["peak_volume_db"] = float(20 * np.log10(peak / full_scale)) if peak > 0 else -float("inf")
+    response["duration"] = n_frames / header["sampling_rate"]
+    response["size"] = os.path.getsize(path)
+    return check_audio(response)
 
 
 def evaluate_audio(path):
+    response = evaluate_wav(path)
+    if response is not None:
+        return response
+    # not a wav file or an exotic codec, ask ffprobe unless the file was already evaluated
+    key = audio_cache.make_key(path, "evaluate_audio") if audio_cache.enabled() else None
+    response = audio_cache.fetch(key) if key else None
+    if response:
+        response.update(Filepath=path, file_type=os.path.splitext(path)[1], file_name=os.path.basename(path))
+        return response
     response = {}
     info = mediainfo(path)
     sound = AudioSegment.from_file(path)
@@ -245,8 +329,16 @@ def evaluate_audio(path):
     response["peak_volume_db"] = sound.max_dBFS
     response["duration"] = float(info["duration"])
     response["size"] = os.path.getsize(path)
-    response["is_wav"] = True if info["format_name"] == "wav" else False
-    response["is_mono"] = True if info["channels"] == "1" else False
+    response = check_audio(response)
+    if key:
+        audio_cache.store(key, meta=response)
+    return response
+
+
+# fill the format flags and the validity of the metadata collected by evaluate_audio or conform_audio
+def check_audio(response):
+    response["is_wav"] = True if response["format"] == "wav" else False
+    response["is_mono"] = True if response["n_channel"] == 1 else False
     response["isPCM"] = True if response["codec"] == "pcm_s16le" else False
     response["is_16bit"] = True if response["sample_format"] == "s16" else False
     response["is_88khz"] = True if response["sampling_rate"] == 88000 else False
@@ -267,8 +359,64 @@ def evaluate_audio(path):
     return response
 
 
+# conform the audio to the delivery format in a single pass: the file is decoded once, resampled to 88kHz,
+# downmixed to mono, peak normalized to the -6..-3 dB window like normalize_audio and written once as s16le.
+# returns the metadata of the written file, the same as evaluate_audio(out_path) would
+def conform_audio(path, out_path, target_sr=88000):
+    key = audio_cache.make_key(path, "conform_audio", target_sr=target_sr) if audio_cache.enabled() else None
+    response = audio_cache.fetch(key, out_path) if key else None
+    if response:
+        response.update(Filepath=out_path, file_type=os.path.splitext(out_path)[1], file_name=os.path.basename(out_path))
+        return response
+
+    import librosa
+
+    try:
+        y, sr = sf.read(path, dtype="float32", always_2d=True)
+        y = y.T
+    except RuntimeError:
+        # formats libsndfile can not decode
+        y, sr = librosa.load(path, sr=None, mono=False)
+        y = np.atleast_2d(y)
+    y = y.mean(axis=0) if y.shape[0] > 1 else y[0]
+    if sr != target_sr:
+        y = librosa.resample(y, orig_sr=sr, target_sr=target_sr)
+
+    peak = np.abs(y).max() if len(y) > 0 else 0
+    peak_db = 20 * np.log10(peak) if peak > 0 else -np.inf
+    if peak_db > -3:
+        y = y * 10 ** ((-3.5 - peak_db) / 20)
+    elif peak_db < -6 and peak > 0:
+        y = y * 10 ** ((-5.5 - peak_db) / 20)
+
+    pcm = np.clip(np.round(y * 32768), -32768, 32767).astype(np.int16)
+    sf.write(out_path, pcm, target_sr, subtype="PCM_16")
+
+    peak = np.abs(pcm.astype(np.int32)).max() if len(pcm) > 0 else 0
+    response = {}
+    response["Filepath"] = out_path
+    response["file_type"] = os.path.splitext(out_path)[1]
+    response["file_name"] = os.path.basename(out_path)
+    response["sampling_rate"] = target_sr
+    response["sample_format"] = "s16"
+    response["format"] = "wav"
+    response["n_channel"] = 1
+    response["bit_rate"] = target_sr * 16
+    response["codec"] = "pcm_s16le"
+    response["peak_volume_db"] = float(20 * np.log10(peak / 32768)) if peak > 0 else -float("inf")
+    response["duration"] = len(pcm) / target_sr
+    response["size"] = os.path.getsize(out_path)
+    response = check_audio(response)
+    if key:
+        audio_cache.store(key, out_path, meta=response)
+    return response
+
+
 #  convert the sampling rate to 88kHz
+@audio_cache.cached_conversion
 def convert_to_88k(path, out_path):
+    import librosa
+
     y, sr = librosa.load(path, sr=None)
     y_88k = librosa.resample(y, orig_sr=sr, target_sr=88000)
     sf.write(out_path, y_88k, 88000)
@@ -276,6 +424,7 @@ def convert_to_88k(path, out_path):
 
 
 # normalize the audio peak_volume_db to be between -6 and -3 db
+@audio_cache.cached_conversion
 def normalize_audio(path, out_path):
     sound = AudioSegment.from_file(path, format="wav")
     if sound.max_dBFS > -3:
@@ -288,18 +437,89 @@ def normalize_audio(path, out_path):
     return out_path
 
 
+# canonical 44 bytes header of a wav file
+def wav_header(format_tag, n_channel, sampling_rate, bits, data_size):
+    block_align = n_channel * bits // 8
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF",
+        36 + data_size + data_size % 2,
+        b"WAVE",
+        b"fmt ",
+        16,
+        format_tag,
+        n_channel,
+        sampling_rate,
+        sampling_rate * block_align,
+        block_align,
+        bits,
+        b"data",
+        data_size,
+    )
+
+
 # trim the audio using start end end time in secs
 def trim_audio(path, start, end, out_path):
-    sound = AudioSegment.from_file(path, format="wav")
-    # make sure that the start and end are in between the audio duration
-    start_time = max(0, start)
-    end_time = min(end, len(sound) / 1000)
-    trimmed_sound = sound[start_time * 1000 : end_time * 1000]
-    trimmed_sound.export(out_path, format="wav")
-    return out_path, start_time, end_time
+    return trim_audio_batch(path, [(start, end, out_path)])[0]
+
+
+# trim several segments out of the same audio, segments is a list of (start, end, out_path) with the times in secs.
+# pcm wav files are memory mapped and each segment is written as a byte range of the source behind a fresh header,
+# other files are decoded once. returns the (out_path, start_time, end_time) of each segment
+def trim_audio_batch(path, segments):
+    if len(segments) == 0:
+        return []
+    if audio_cache.enabled():
+        keys = [audio_cache.make_key(path, "trim_audio", start=start, end=end) for start, end, _ in segments]
+        cached = [audio_cache.fetch(key, out_path) for key, (_, _, out_path) in zip(keys, segments)]
+        missing = [i for i, meta in enumerate(cached) if not meta]
+        if missing:
+            trimmed = _trim_audio_batch(path, [segments[i] for i in missing])
+            for i, (out_path, start_time, end_time) in zip(missing, trimmed):
+                audio_cache.store(keys[i], out_path, meta={"start_time": start_time, "end_time": end_time})
+                cached[i] = {"start_time": start_time, "end_time": end_time}
+        return [(out_path, meta["start_time"], meta["end_time"]) for (_, _, out_path), meta in zip(segments, cached)]
+    return _trim_audio_batch(path, segments)
+
+
+def _trim_audio_batch(path, segments):
+    header = read_wav_header(path)
+    if header is None:
+        sound = AudioSegment.from_file(path, format="wav")
+        results = []
+        for start, end, out_path in segments:
+            # make sure that the start and end are in between the audio duration
+            start_time = max(0, start)
+            end_time = min(end, len(sound) / 1000)
+            trimmed_sound = sound[start_time * 1000 : end_time * 1000]
+            trimmed_sound.export(out_path, format="wav")
+            results.append((out_path, start_time, end_time))
+        return results
+
+    block_align = header["n_channel"] * header["bits"] // 8
+    n_frames = header["data_size"] // block_align
+    duration = n_frames / header["sampling_rate"]
+    data = np.memmap(path, dtype=np.uint8, mode="r", offset=header["data_offset"], shape=(n_frames * block_align,)) if n_frames > 0 else b""
+    results = []
+    for start, end, out_path in segments:
+        # make sure that the start and end are in between the audio duration
+        start_time = max(0, start)
+        end_time = min(end, duration)
+        first = int(start_time * header["sampling_rate"])
+        last = max(first, int(end_time * header["sampling_rate"]))
+        chunk = data[first * block_align : last * block_align]
+        with open(out_path, "wb") as f:
+            f.write(wav_header(header["format_tag"], header["n_channel"], header["sampling_rate"], header["bits"], len(chunk)))
+            f.write(memoryview(chunk))
+            if len(chunk) % 2:
+                f.write(b"\x00")
+        results.append((out_path, start_time, end_time))
+    del data
+    return results
 
 
 # convert the audio to mono
+@audio_cache.cached_conversion
 def convert_to_mono(path, out_path):
     sound = AudioSegment.from_file(path, format="wav")
     mono_sound = sound.set_channels(1)
@@ -307,6 +527,7 @@ def convert_to_mono(path, out_path):
     return out_path
 
 
+@audio_cache.cached_conversion
 def convert_to_s16le(path, out_path):
     sound = AudioSegment.from_file(path, format="wav")
     s16le_sound = sound.set_sample_width(2)
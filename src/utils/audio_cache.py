@@ -0,0 +1,205 @@
+"""Content addressed cache of the audio operations.
+
+An entry is keyed by the sha256 of the source file content, the operation name and its parameters, so a re-run over
+unchanged files only costs hashing them. An entry holds the output file of the operation and/or a json of metadata.
+The least recently used entries are evicted once the cache grows over AUDIO_CACHE_MAX_GB, 0 disables the cache.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from functools import wraps
+from typing import Optional
+
+from src.logger import root_logger
+from src.paths import paths
+
+
+app_logger = root_logger.getChild("audio_cache")
+
+CACHE_DIR = paths.LOCAL_BUCKET_DIR / ".cache"
+MAX_BYTES = float(os.environ.get("AUDIO_CACHE_MAX_GB", 20)) * 1024**3
+
+_lock = threading.Lock()
+# sha256 of the files hashed by this process, keyed by (path, size, mtime) so modified files are hashed again
+_hashes: dict = {}
+# size of the cache directory, scanned on the first store
+_size: Optional[int] = None
+
+
+def enabled() -> bool:
+    return MAX_BYTES > 0
+
+
+def content_hash(path: str) -> str:
+    """Get the sha256 of the content of a file.
+
+    Args:
+        path (str): The file to hash.
+
+    Returns:
+        str: The hex digest.
+    """
+    stat = os.stat(path)
+    memo_key = (os.path.realpath(path), stat.st_size, stat.st_mtime_ns)
+    if memo_key in _hashes:
+        return _hashes[memo_key]
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            sha.update(block)
+    _hashes[memo_key] = sha.hexdigest()
+    return _hashes[memo_key]
+
+
+def make_key(path: str, operation: str, **params) -> str:
+    """Get the cache key of an operation on a file.
+
+    Args:
+        path (str): The source file of the operation.
+        operation (str): The name of the operation.
+        **params: The parameters the output of the operation depends on.
+
+    Returns:
+        str: The cache key.
+    """
+    description = json.dumps({"source": content_hash(path), "operation": operation, "params": params}, sort_keys=True, default=str)
+    return hashlib.sha256(description.encode()).hexdigest()
+
+
+def _entry(key: str, suffix: str) -> str:
+    return os.path.join(CACHE_DIR, key[:2], key + suffix)
+
+
+def fetch(key: str, out_path: str = None) -> Optional[dict]:
+    """Get a cache entry.
+
+    Args:
+        key (str): The cache key, see make_key.
+        out_path (str, optional): Where to copy the cached output file, if the entry has one. Defaults to None.
+
+    Returns:
+        Optional[dict]: The cached metadata, an empty dict if the entry has no metadata, None on a miss.
+    """
+    if not enabled():
+        return None
+    file_entry, meta_entry = _entry(key, ".wav"), _entry(key, ".json")
+    try:
+        if out_path is not None:
+            if not os.path.exists(file_entry):
+                return None
+            # a copy, not a link: callers modify their outputs in place
+            shutil.copyfile(file_entry, out_path)
+            os.utime(file_entry)
+        meta = {}
+        if os.path.exists(meta_entry):
+            with open(meta_entry) as f:
+                meta = json.load(f)
+            os.utime(meta_entry)
+        elif out_path is None:
+            return None
+        app_logger.debug(f"Cache hit {key}")
+        return meta
+    except OSError as e:
+        app_logger.warning(f"Failed to read cache entry {key}: {e}")
+        return None
+
+
+def store(key: str, path: str = None, meta: dict = None) -> None:
+    """Add an entry to the cache, evicting the least recently used entries if the cache is full.
+
+    Args:
+        key (str): The cache key, see make_key.
+        path (str, optional): The output file of the operation. Defaults to None.
+        meta (dict, optional): The metadata of the operation, must be json serializable. Defaults to None.
+    """
+    global _size
+    if not enabled():
+        return
+    try:
+        os.makedirs(os.path.dirname(_entry(key, "")), exist_ok=True)
+        added = 0
+        if path is not None:
+            added += _write(_entry(key, ".wav"), lambda f: _copy(path, f))
+        if meta is not None:
+            added += _write(_entry(key, ".json"), lambda f: f.write(json.dumps(meta, default=str).encode()))
+    except OSError as e:
+        app_logger.warning(f"Failed to store cache entry {key}: {e}")
+        return
+    with _lock:
+        if _size is None:
+            _size = _scan_size()
+        else:
+            _size += added
+        if _size > MAX_BYTES:
+            _size = evict(int(MAX_BYTES * 0.9))
+
+
+def _write(entry: str, write) -> int:
+    # write next to the entry and rename, so concurrent readers never see a partial file
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(entry), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.replace(tmp_path, entry)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return os.path.getsize(entry)
+
+
+def _copy(path: str, f) -> None:
+    with open(path, "rb") as source:
+        shutil.copyfileobj(source, f)
+
+
+def _scan_size() -> int:
+    return sum(entry.stat().st_size for entry in CACHE_DIR.glob("*/*") if entry.is_file())
+
+
+def evict(max_bytes: int) -> int:
+    """Remove the least recently used cache entries until the cache fits in max_bytes.
+
+    Args:
+        max_bytes (int): The target size of the cache.
+
+    Returns:
+        int: The size of the cache after eviction.
+    """
+    entries = []
+    for entry in CACHE_DIR.glob("*/*"):
+        try:
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry))
+        except OSError:
+            continue
+    size = sum(entry_size for _, entry_size, _ in entries)
+    for _, entry_size, entry in sorted(entries):
+        if size <= max_bytes:
+            break
+        try:
+            entry.unlink()
+            size -= entry_size
+        except OSError:
+            continue
+    app_logger.info(f"Evicted the audio cache down to {size / 1024**3:.2f} GB")
+    return size
+
+
+def cached_conversion(func):
+    # caches the output of the audio conversions with a (path, out_path) -> out_path signature
+    @wraps(func)
+    def wrapper(path, out_path):
+        if not enabled():
+            return func(path, out_path)
+        # the key is taken before the conversion, which may overwrite the source in place
+        key = make_key(path, func.__name__)
+        if fetch(key, out_path) is not None:
+            return out_path
+        result = func(path, out_path)
+        store(key, out_path)
+        return result
+
+    return wrapper
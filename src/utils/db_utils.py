@@ -1,26 +1,27 @@
 import os
 import shutil
-import tempfile
-from concurrent.futures import ThreadPoolExecutor
-from datetime import datetime
-from typing import List, Tuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Tuple
 
 import boto3
+import botocore
 import pandas as pd
 import streamlit_authenticator as stauth
 import yaml
 from celery import Task
 from dotenv import load_dotenv
 from fastapi_sqlalchemy import db
-from sqlalchemy import not_
+from sqlalchemy import exists, func, not_, tuple_, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.exc import SQLAlchemyError
 from tqdm import tqdm
 from yaml.loader import SafeLoader
 
 from src.logger import root_logger
 from src.paths import paths
-from src.service.models import Annotation, Annotator, annotator_dataset, Dataset, Sample, Status  # noqa: F401
-from src.utils.audio import convert_to_88k, convert_to_mono, convert_to_s16le, evaluate_audio, normalize_audio, trim_audio  # noqa: F401
+from src.service.models import Annotation, Annotator, annotator_dataset, Dataset, DatasetProgress, Sample, Status  # noqa: F401
+from src.utils.audio import conform_audio, convert_to_88k, convert_to_mono, convert_to_s16le, evaluate_audio, normalize_audio, trim_audio  # noqa: F401
 
 
 BASE_DIR = str(paths.PROJECT_ROOT_DIR.resolve())
@@ -37,12 +38,23 @@ POSTGRES_URL = os.getenv("POSTGRES_URL")
 
 
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 
 
 engine = create_engine(POSTGRES_URL)
 SessionObject = sessionmaker(bind=engine)
-session = SessionObject()
+
+
+# upper bound of the samples an annotator can claim at once
+MAX_CLAIM_BATCH = 50
+
+
+def lease_expiry():
+    """Get the expiry time of a lock lease taken now, the lease length is MAX_LOCKING_MIN minutes.
+
+    The lease times are computed and compared on the database clock, never on the clock of the api host.
+    """
+    return func.now() + timedelta(minutes=float(os.getenv("MAX_LOCKING_MIN", 5)))
 
 
 def generate_password_hash(password: str) -> str:
@@ -80,6 +92,7 @@ def create_dataset(name: str, language: str, description: str) -> Dataset:
             raise ValueError(f"Dataset {name} already exists")
 
         dataset = Dataset(name=name, language=language, description=description)
+        dataset.progress = DatasetProgress(n_samples=0, n_selected=0, n_ready=0, n_annotated=0)
         db.session.add(dataset)
         # create paths for the dataset
         dataset_path = paths.LOCAL_BUCKET_DIR / s3_dataset_dir / dataset.name
@@ -224,6 +237,16 @@ def update_dataset(id: int, **kwargs) -> None:
         raise e
 
 
+def _annotators_query(session_: Session, dataset_id: int):
+    # the annotators with annotations on the samples of the dataset selected for delivery
+    return (
+        session_.query(Annotator)
+        .join(Annotation, Annotator.id == Annotation.annotator_id)
+        .join(Sample, Annotation.sample_id == Sample.id)
+        .filter(Sample.dataset_id == dataset_id, Sample.is_selected_for_delivery == True)
+    )
+
+
 def get_annotators_of_dataset(id: int) -> List[Annotator]:
     """Get the annotators of a dataset.
 
@@ -241,13 +264,7 @@ def get_annotators_of_dataset(id: int) -> List[Annotator]:
         if not dataset:
             raise ValueError(f"Dataset {id} does not exist")
         # get the annotators that has samples annotated in this dataset
-        annotators = (
-            db.session.query(Annotator)
-            .join(Annotation, Annotator.id == Annotation.annotator_id)
-            .join(Sample, Annotation.sample_id == Sample.id)
-            .filter(Sample.dataset_id == id, Sample.is_selected_for_delivery == True)
-        )
-        annotators = annotators.all()
+        annotators = _annotators_query(db.session, id).all()
         db.session.commit()
         return annotators
     except SQLAlchemyError as e:
@@ -260,59 +277,194 @@ def get_annotators_of_dataset(id: int) -> List[Annotator]:
         raise e
 
 
+# the columns of an annotation export row, in export order
+ANNOTATION_EXPORT_COLUMNS = [
+    Sample.filename,
+    Sample.original_text,
+    Sample.sentence_type,
+    Annotation.status,
+    Annotator.name.label("annotator"),
+    Annotation.feedback,
+    Annotation.final_text,
+    Annotation.final_sentence_type,
+    Annotation.isRepeated,
+    Annotation.incorrectProsody,
+    Annotation.inconsistentTextAudio,
+    Annotation.incorrectTrancuation,
+    Annotation.soundArtifacts,
+]
+ANNOTATION_EXPORT_FIELDS = [column.key for column in ANNOTATION_EXPORT_COLUMNS]
+
+
+def _annotations_query(session_: Session, dataset_id: int):
+    # only the exported columns are selected, ordered by (filename, annotation id) which is unique and serves as the keyset
+    return (
+        session_.query(*ANNOTATION_EXPORT_COLUMNS, Annotation.id)
+        .join(Annotator, Annotation.annotator_id == Annotator.id)
+        .join(Sample, Annotation.sample_id == Sample.id)
+        .filter(Sample.dataset_id == dataset_id)
+        .filter(Sample.is_selected_for_delivery == True)
+        .order_by(Sample.filename, Annotation.id)
+    )
+
+
+def _annotation_row_to_dict(row) -> dict:
+    result_dict = {field: row[i] for i, field in enumerate(ANNOTATION_EXPORT_FIELDS)}
+    result_dict["status"] = result_dict["status"].value if result_dict["status"] else None
+    return result_dict
+
+
 def get_annotations_of_dataset(id: int) -> List[dict]:
-    # need to join samples, annotations, annotators. it should return annotation and together with annotater name
+    """Get all the annotations of the samples of a dataset selected for delivery, together with the annotator name.
+
+    Args:
+        id (int): The dataset id.
+
+    Returns:
+        List[dict]: The annotations ordered by sample filename, see ANNOTATION_EXPORT_FIELDS.
+    """
     app_logger.debug(f"POSTGRES: Getting annotations of dataset {id}")
     try:
+        # check if the dataset exists
+        dataset = db.session.query(Dataset).filter(Dataset.id == id).first()
+        if not dataset:
+            raise ValueError(f"Dataset {id} does not exist")
+        return [_annotation_row_to_dict(row) for row in _annotations_query(db.session, id)]
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        app_logger.error(f"Failed to get annotations of dataset. SQLAlchemyError: {e}")
+        raise e
+    except Exception as e:
+        db.session.rollback()
+        app_logger.error(f"Failed to get annotations of dataset. Error: {e}")
+        raise e
+
+
+def get_annotations_page(id: int, after_filename: str = None, after_id: int = None, limit: int = 1000) -> Tuple[List[dict], dict]:
+    """Get a page of the annotations of a dataset, paginated on (filename, annotation id).
 
+    Args:
+        id (int): The dataset id.
+        after_filename (str, optional): The filename of the cursor returned with the previous page. Defaults to None.
+        after_id (int, optional): The annotation id of the cursor returned with the previous page. Defaults to None.
+        limit (int, optional): The page size. Defaults to 1000.
+
+    Returns:
+        Tuple[List[dict], dict]: The annotations and the cursor of the next page, None on the last page.
+    """
+    app_logger.debug(f"POSTGRES: Getting annotations of dataset {id} after ({after_filename}, {after_id})")
+    try:
         # check if the dataset exists
         dataset = db.session.query(Dataset).filter(Dataset.id == id).first()
         if not dataset:
             raise ValueError(f"Dataset {id} does not exist")
-        # join annotator and annotation and only get annotations of samples of this dataset
-        # for each annotation also append the annotator name by joining on annotator_id
-        # it should return all samples even if there is no annotation
-        results = (
-            session.query(Annotation, Annotator, Sample)
-            .join(Annotator, Annotation.annotator_id == Annotator.id)
-            .join(Sample, Annotation.sample_id == Sample.id, isouter=True)
-            .filter(Sample.dataset_id == id)
-            .filter(Sample.is_selected_for_delivery == True)
-            .order_by(Sample.filename)
-        )
+        query = _annotations_query(db.session, id)
+        if after_filename is not None:
+            query = query.filter(tuple_(Sample.filename, Annotation.id) > (after_filename, after_id if after_id is not None else 0))
+        rows = query.limit(limit).all()
+        cursor = {"after_filename": rows[-1].filename, "after_id": rows[-1].id} if len(rows) == limit else None
+        return [_annotation_row_to_dict(row) for row in rows], cursor
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        app_logger.error(f"Failed to get annotations of dataset. SQLAlchemyError: {e}")
+        raise e
+    except Exception as e:
+        db.session.rollback()
+        app_logger.error(f"Failed to get annotations of dataset. Error: {e}")
+        raise e
 
-        results = results.all()
-        # Process the results and create a list of dictionaries
-        result_list = []
-        for annotation, annotator, sample in results:
-            # get following values filename, annotation status (reviewd, discarded or none if there is no annotation)
-            result_dict = {
-                "filename": sample.filename,
-                "original_text": sample.original_text if sample else None,
-                "sentence_type": sample.sentence_type if sample else None,
-                "status": annotation.status.value if annotation else None,
-                "annotator": annotator.name if annotator else None,
-                "feedback": annotation.feedback if annotation else None,
-                "final_text": annotation.final_text if annotation else None,
-                "final_sentence_type": annotation.final_sentence_type if annotation else None,
-                "isRepeated": annotation.isRepeated if annotation else None,
-                "incorrectProsody": annotation.incorrectProsody if annotation else None,
-                "inconsistentTextAudio": annotation.inconsistentTextAudio if annotation else None,
-                "incorrectTrancuation": annotation.incorrectTrancuation if annotation else None,
-                "soundArtifacts": annotation.soundArtifacts if annotation else None,
-            }
-            result_list.append(result_dict)
-        return result_list
+
+def iter_annotations_of_dataset(id: int, batch_size: int = 1000) -> Iterator[dict]:
+    """Stream the annotations of a dataset with a server side cursor, in constant memory.
+
+    The generator outlives the request, so it runs on its own session which is closed once the export is consumed.
+
+    Args:
+        id (int): The dataset id.
+        batch_size (int, optional): The number of rows fetched from the cursor at once. Defaults to 1000.
+
+    Yields:
+        dict: The annotations ordered by sample filename, see ANNOTATION_EXPORT_FIELDS.
+    """
+    app_logger.debug(f"POSTGRES: Streaming annotations of dataset {id}")
+    session_ = SessionObject()
+    try:
+        for row in _annotations_query(session_, id).yield_per(batch_size):
+            yield _annotation_row_to_dict(row)
+    except Exception as e:
+        app_logger.error(f"Failed to stream annotations of dataset. Error: {e}")
+        raise e
+    finally:
+        session_.close()
+
+
+def _progress_query(session_: Session, dataset_id: int):
+    return session_.query(DatasetProgress).filter(DatasetProgress.dataset_id == dataset_id)
+
+
+def get_dataset_progress(id: int) -> DatasetProgress:
+    """Get the progress counters of a dataset.
+
+    Args:
+        id (int): The dataset id.
+
+    Returns:
+        DatasetProgress: The progress counters.
+    """
+    app_logger.debug(f"POSTGRES: Getting progress of dataset {id}")
+    try:
+
+        progress = _progress_query(db.session, id).first()
+        if not progress:
+            raise ValueError(f"Dataset {id} does not exist")
+        return progress
     except SQLAlchemyError as e:
         db.session.rollback()
-        app_logger.error(f"Failed to query next sample. SQLAlchemyError: {e}")
+        app_logger.error(f"Failed to get dataset progress. SQLAlchemyError: {e}")
         raise e
     except Exception as e:
         db.session.rollback()
-        app_logger.error(f"Failed to query next sample. Error: {e}")
+        app_logger.error(f"Failed to get dataset progress. Error: {e}")
         raise e
 
 
+def bump_dataset_progress(session_: Session, dataset_id: int, **deltas: int) -> None:
+    """Increment the progress counters of a dataset in the current transaction, the caller commits.
+
+    Args:
+        session_ (Session): The session of the transaction.
+        dataset_id (int): The dataset id.
+        **deltas: The increments keyed by counter, e.g. n_annotated=1.
+    """
+    values = {getattr(DatasetProgress, name): getattr(DatasetProgress, name) + delta for name, delta in deltas.items()}
+    session_.query(DatasetProgress).filter(DatasetProgress.dataset_id == dataset_id).update(values, synchronize_session=False)
+
+
+def refresh_dataset_progress(session_: Session, dataset_id: int) -> None:
+    """Recompute the progress counters of a dataset from its samples, the caller commits.
+
+    This scans the samples of the dataset, it is meant for bulk changes (deletions, delivery selection) and repairs,
+    the hot paths use bump_dataset_progress.
+
+    Args:
+        session_ (Session): The session of the transaction.
+        dataset_id (int): The dataset id.
+    """
+    n_samples, n_selected, n_ready, n_annotated = (
+        session_.query(
+            func.count(Sample.id),
+            func.count(Sample.id).filter(Sample.is_selected_for_delivery == True),
+            func.count(Sample.id).filter(*_qa_ready_filters()),
+            func.count(Sample.id).filter(Sample.is_selected_for_delivery == True, _is_annotated()),
+        )
+        .filter(Sample.dataset_id == dataset_id)
+        .one()
+    )
+    counters = {"n_samples": n_samples, "n_selected": n_selected, "n_ready": n_ready, "n_annotated": n_annotated, "updated_at": func.now()}
+    statement = pg_insert(DatasetProgress).values(dataset_id=dataset_id, **counters)
+    session_.execute(statement.on_conflict_do_update(index_elements=[DatasetProgress.dataset_id], set_=counters))
+
+
 ########################
 #### ANNOTATOR UTILS ###
 ########################
@@ -458,8 +610,17 @@ def delete_annotator(id: int) -> None:
             except Exception as e:
                 app_logger.error(f"POSTGRES: Failed to delete annotator_dataset table for annotator {id}")
                 app_logger.error(e)
-            # delete the annotator from the database
+            # delete the annotator from the database, its annotations no longer count in the progress of their datasets
+            dataset_ids = [
+                dataset_id
+                for (dataset_id,) in db.session.query(Sample.dataset_id)
+                .join(Annotation, Annotation.sample_id == Sample.id)
+                .filter(Annotation.annotator_id == id)
+                .distinct()
+            ]
             db.session.query(Annotator).filter(Annotator.id == id).delete()
+            for dataset_id in dataset_ids:
+                refresh_dataset_progress(db.session, dataset_id)
             db.session.commit()
         except Exception as e:
             app_logger.error(f"POSTGRES: Failed to delete annotator {id}")
@@ -606,6 +767,18 @@ def get_datasets_of_annotator(annotator_id: int) -> List[Dataset]:
         raise e
 
 
+def _latest_sample_query(session_: Session, annotator_id: int, dataset_id: int):
+    # the samples of the dataset annotated by the annotator, the latest annotation first
+    return (
+        session_.query(Sample)
+        .join(Annotation, Sample.id == Annotation.sample_id)
+        .join(Annotator, Annotation.annotator_id == Annotator.id)
+        .filter(Sample.dataset_id == dataset_id)
+        .filter(Annotator.id == annotator_id)
+        .order_by(Annotation.created_at.desc())
+    )
+
+
 def get_latest_sample_of_annotator(annotator_id: int, dataset_id: int) -> Sample:
     """Get the latest sample of an annotator.
 
@@ -628,15 +801,7 @@ def get_latest_sample_of_annotator(annotator_id: int, dataset_id: int) -> Sample
         if not dataset:
             raise ValueError(f"Dataset {dataset_id} does not exist")
         # get the latest sample of the annotator
-        sample = (
-            db.session.query(Sample)
-            .join(Annotation, Sample.id == Annotation.sample_id)
-            .join(Annotator, Annotation.annotator_id == Annotator.id)
-            .filter(Sample.dataset_id == dataset_id)
-            .filter(Annotator.id == annotator_id)
-            .order_by(Annotation.created_at.desc())
-            .first()
-        )
+        sample = _latest_sample_query(db.session, annotator_id, dataset_id).first()
         db.session.commit()
         return sample
     except SQLAlchemyError as e:
@@ -727,6 +892,8 @@ def update_sample(id: int, **kwargs) -> None:
             raise ValueError(f"Sample {id} does not exist")
 
         db.session.query(Sample).filter(Sample.id == id).update(kwargs)
+        if set(kwargs) & QA_FIELDS:
+            refresh_dataset_progress(db.session, sample.dataset_id)
         db.session.commit()
     except SQLAlchemyError as e:
         db.session.rollback()
@@ -753,6 +920,7 @@ def delete_sample(id: int) -> None:
             raise ValueError(f"Sample {id} does not exist")
 
         db.session.query(Sample).filter(Sample.id == id).delete()
+        refresh_dataset_progress(db.session, sample.dataset_id)
         db.session.commit()
     except SQLAlchemyError as e:
         db.session.rollback()
@@ -764,35 +932,87 @@ def delete_sample(id: int) -> None:
         raise e
 
 
-def list_samples(dataset_id: int, top_k: int = None) -> List[Sample]:
-    """List all the samples in the database.
+# the sample columns that can be projected by list_samples
+SAMPLE_FIELDS = [column.key for column in Sample.__table__.columns]
+
+
+def _list_samples_query(
+    session_: Session,
+    dataset_id: int,
+    fields: List[str],
+    top_k: int = None,
+    after_id: int = None,
+    min_wer: float = None,
+    max_wer: float = None,
+    is_valid: bool = None,
+    deliverable: str = None,
+):
+    # a page of the samples of the dataset in id order with the given columns, see list_samples
+    query = session_.query(*[getattr(Sample, field) for field in fields]).filter(Sample.dataset_id == dataset_id)
+    if after_id is not None:
+        query = query.filter(Sample.id > after_id)
+    if min_wer is not None:
+        query = query.filter(Sample.wer >= min_wer)
+    if max_wer is not None:
+        query = query.filter(Sample.wer <= max_wer)
+    if is_valid is not None:
+        query = query.filter(Sample.isValid == is_valid)
+    if deliverable is not None:
+        query = query.filter(Sample.deliverable == deliverable)
+    query = query.order_by(Sample.id)
+    if top_k:
+        query = query.limit(top_k)
+    return query
+
+
+def list_samples(
+    dataset_id: int,
+    top_k: int = None,
+    after_id: int = None,
+    fields: List[str] = None,
+    min_wer: float = None,
+    max_wer: float = None,
+    is_valid: bool = None,
+    deliverable: str = None,
+) -> List[dict]:
+    """List the samples of a dataset ordered by id, paginated on the sample id.
 
     Args:
         dataset_id (int): The dataset id to list the samples from.
+        top_k (int, optional): The maximum number of samples to return, all of them if None. Defaults to None.
+        after_id (int, optional): Only return the samples after this id, i.e. the id of the last sample of the previous page. Defaults to None.
+        fields (List[str], optional): The sample columns to return, all of them if None. The id is always returned. Defaults to None.
+        min_wer (float, optional): Only return the samples with a wer greater than or equal to this. Defaults to None.
+        max_wer (float, optional): Only return the samples with a wer less than or equal to this. Defaults to None.
+        is_valid (bool, optional): Only return the samples with this isValid value. Defaults to None.
+        deliverable (str, optional): Only return the samples of this deliverable. Defaults to None.
 
     Returns:
-        List[Sample]: The list of samples.
+        List[dict]: The samples with the requested fields.
     """
-    app_logger.debug(f"POSTGRES: Listing samples for dataset {dataset_id}")
+    app_logger.debug(f"POSTGRES: Listing samples for dataset {dataset_id} after {after_id}")
     try:
 
         # check if the dataset already exists
         dataset = db.session.query(Dataset).filter(Dataset.id == dataset_id).first()
         if not dataset:
             raise ValueError(f"Dataset {dataset_id} does not exist")
-        if top_k:
-            samples = db.session.query(Sample).filter(Sample.dataset_id == dataset_id).limit(top_k).all()
-        else:
-            samples = db.session.query(Sample).filter(Sample.dataset_id == dataset_id).all()
-
-        return samples
+        fields = fields or SAMPLE_FIELDS
+        unknown = [field for field in fields if field not in SAMPLE_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown sample fields {unknown}")
+        if "id" not in fields:
+            fields = ["id"] + fields
+
+        query = _list_samples_query(db.session, dataset_id, fields, top_k, after_id, min_wer, max_wer, is_valid, deliverable)
+        return [dict(zip(fields, row)) for row in query]
     except SQLAlchemyError as e:
         db.session.rollback()
-        app_logger.error(f"Failed to query next sample. SQLAlchemyError: {e}")
+        app_logger.error(f"Failed to list samples. SQLAlchemyError: {e}")
         raise e
     except Exception as e:
         db.session.rollback()
-        app_logger.error(f"Failed to query next sample. Error: {e}")
+        app_logger.error(f"Failed to list samples. Error: {e}")
         raise e
 
 
@@ -824,7 +1044,7 @@ def get_sample_by_id(id: int) -> Sample:
         raise e
 
 
-def lock_sample(id: int) -> bool:
+def lock_sample(id: int, annotator_id: int = None) -> bool:
     # set param islocked to true
     app_logger.debug(f"POSTGRES: Locking sample {id}")
     try:
@@ -835,7 +1055,9 @@ def lock_sample(id: int) -> bool:
             raise ValueError(f"Sample {id} does not exist")
 
         sample.islocked = True
-        sample.locked_at = datetime.now()
+        sample.locked_at = func.now()
+        sample.locked_by = annotator_id
+        sample.expires_at = lease_expiry()
         db.session.commit()
         return True
     except SQLAlchemyError as e:
@@ -859,6 +1081,8 @@ def unlock_sample(id: int) -> bool:
             raise ValueError(f"Sample {id} does not exist")
 
         sample.islocked = False
+        sample.locked_by = None
+        sample.expires_at = None
         db.session.commit()
         return True
     except SQLAlchemyError as e:
@@ -871,6 +1095,77 @@ def unlock_sample(id: int) -> bool:
         raise e
 
 
+def renew_lock(id: int, annotator_id: int) -> datetime:
+    """Extend the lock lease of a sample held by an annotator.
+
+    This is a single-row UPDATE ... RETURNING, cheap enough to run on every rerun of the QA page.
+
+    Args:
+        id (int): The sample id.
+        annotator_id (int): The annotator id that holds the lock.
+
+    Returns:
+        datetime: The new expiry time of the lease.
+    """
+    app_logger.debug(f"POSTGRES: Renewing lock of sample {id} for annotator {annotator_id}")
+    try:
+        expires_at = db.session.execute(
+            update(Sample)
+            .where(Sample.id == id, Sample.islocked == True, Sample.locked_by == annotator_id)
+            .values(expires_at=lease_expiry())
+            .returning(Sample.expires_at)
+        ).scalar()
+        db.session.commit()
+        if expires_at is None:
+            raise ValueError(f"Sample {id} is not locked by annotator {annotator_id}")
+        return expires_at
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        app_logger.error(f"Failed to renew lock. SQLAlchemyError: {e}")
+        raise e
+    except Exception as e:
+        db.session.rollback()
+        app_logger.error(f"Failed to renew lock. Error: {e}")
+        raise e
+
+
+def _add_annotation(sample_id: int, annotator_id: int, status: str, **fields) -> Sample:
+    """Add an annotation to a sample and release the annotator's lease on it, the caller commits.
+
+    Args:
+        sample_id (int): The sample id to annotate.
+        annotator_id (int): The annotator id to annotate.
+        status (str): The annotation status.
+        **fields: The annotation fields.
+
+    Returns:
+        Sample: The annotated sample.
+    """
+    # check if the sample exists, the row lock serializes concurrent annotations of the sample until the caller commits
+    sample = db.session.query(Sample).filter(Sample.id == sample_id).with_for_update().first()
+    if not sample:
+        raise ValueError(f"Sample {sample_id} does not exist")
+
+    # check if the annotator exists
+    annotator = db.session.query(Annotator).filter(Annotator.id == annotator_id).first()
+    if not annotator:
+        raise ValueError(f"Annotator {annotator_id} does not exist")
+
+    # only the first annotation of a selected sample moves the progress
+    if sample.is_selected_for_delivery and db.session.query(Annotation.id).filter(Annotation.sample_id == sample_id).first() is None:
+        bump_dataset_progress(db.session, sample.dataset_id, n_annotated=1)
+
+    # create annotation
+    annotation = Annotation(sample_id=sample_id, annotator_id=annotator_id, status=Status(status), **fields)
+    db.session.add(annotation)
+    # the annotation is done, release the lease in the same transaction
+    if sample.locked_by == annotator_id:
+        sample.islocked = False
+        sample.locked_by = None
+        sample.expires_at = None
+    return sample
+
+
 def annotate_sample(
     sample_id: int,
     annotator_id: int,
@@ -899,21 +1194,10 @@ def annotate_sample(
     """
     app_logger.debug(f"POSTGRES: Annotating sample {sample_id}")
     try:
-
-        # check if the sample exists
-        sample = db.session.query(Sample).filter(Sample.id == sample_id).first()
-        if not sample:
-            raise ValueError(f"Sample {sample_id} does not exist")
-
-        # check if the annotator exists
-        annotator = db.session.query(Annotator).filter(Annotator.id == annotator_id).first()
-        if not annotator:
-            raise ValueError(f"Annotator {annotator_id} does not exist")
-
-        # create annotation
-        annotation = Annotation(
-            sample_id=sample_id,
-            annotator_id=annotator_id,
+        _add_annotation(
+            sample_id,
+            annotator_id,
+            status,
             final_text=final_text,
             final_sentence_type=final_sentence_type,
             isRepeated=isRepeated,
@@ -928,9 +1212,7 @@ def annotate_sample(
             incorrectTrancuation=incorrectTrancuation,
             soundArtifacts=soundArtifacts,
             feedback=feedback,
-            status=Status(status),
         )
-        db.session.add(annotation)
         db.session.commit()
     except SQLAlchemyError as e:
         db.session.rollback()
@@ -942,19 +1224,150 @@ def annotate_sample(
         raise e
 
 
-def correct_locked_times() -> bool:
-    # if locked time is more than 30 minutes then unlock
-    app_logger.debug(f"POSTGRES: Correcting locked times")
+def _expire_locks_statement():
+    # release the locks whose lease has passed on the database clock
+    return (
+        update(Sample)
+        .where(Sample.islocked == True, Sample.expires_at < func.now())
+        .values(islocked=False, locked_by=None, expires_at=None)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def expire_locks() -> int:
+    """Release every lock whose lease has expired with a single set-based UPDATE.
+
+    It runs on its own session since it is called by the lock reaper outside of any request.
+
+    Returns:
+        int: The number of released samples.
+    """
+    app_logger.debug("POSTGRES: Expiring locks")
+    session_ = SessionObject()
     try:
+        released = session_.execute(_expire_locks_statement()).rowcount
+        session_.commit()
+        if released:
+            app_logger.info(f"POSTGRES: Released {released} expired locks")
+        return released
+    except SQLAlchemyError as e:
+        session_.rollback()
+        app_logger.error(f"Failed to expire locks. SQLAlchemyError: {e}")
+        raise e
+    except Exception as e:
+        session_.rollback()
+        app_logger.error(f"Failed to expire locks. Error: {e}")
+        raise e
+    finally:
+        session_.close()
 
-        # check if the sample exists
-        samples = db.session.query(Sample).filter(Sample.islocked == True).all()
-        for sample in samples:
-            if sample.locked_at:
-                if (datetime.now() - sample.locked_at).total_seconds() > float(os.getenv("MAX_LOCKING_MIN")) * 60:
-                    sample.islocked = False
-                    db.session.commit()
-        return True
+
+def _is_annotated():
+    # correlated EXISTS against annotation.sample_id, used as an anti-join instead of materializing the outer join
+    return exists().where(Annotation.sample_id == Sample.id)
+
+
+# the sample columns _qa_filters depends on, an update of one of them may change the n_ready counter
+QA_FIELDS = {"is_selected_for_delivery", "local_trimmed_path", "s3TrimmedPath", "asr_text", "trimmed_audio_duration"}
+
+
+def count_qa_samples(session_: Session, sample_ids: List[int]) -> Dict[int, int]:
+    """Count the samples that are part of the QA of their dataset, see _qa_filters.
+
+    Args:
+        session_ (Session): The session of the transaction.
+        sample_ids (List[int]): The ids of the samples to count.
+
+    Returns:
+        Dict[int, int]: The number of QA samples keyed by dataset id.
+    """
+    rows = (
+        session_.query(Sample.dataset_id, func.count(Sample.id))
+        .filter(Sample.id.in_(sample_ids), *_qa_ready_filters())
+        .group_by(Sample.dataset_id)
+        .all()
+    )
+    return dict(rows)
+
+
+def _qa_filters(dataset_id: int) -> list:
+    """Filters of the samples that are part of the QA of a dataset, i.e. selected for delivery, trimmed and transcribed.
+
+    They mirror the partial index ix_sample_next_candidate so the planner can walk it in wer order.
+
+    Args:
+        dataset_id (int): The dataset id.
+
+    Returns:
+        list: The filter clauses.
+    """
+    return [Sample.dataset_id == dataset_id] + _qa_ready_filters()
+
+
+def _qa_ready_filters() -> list:
+    # the conditions of _qa_filters on the sample itself, regardless of its dataset
+    return [
+        Sample.is_selected_for_delivery == True,
+        Sample.local_trimmed_path.isnot(None),
+        Sample.s3TrimmedPath.isnot(None),
+        Sample.asr_text.isnot(None),
+        Sample.trimmed_audio_duration.isnot(None),
+    ]
+
+
+def _next_sample_filters(dataset_id: int) -> list:
+    """Filters of the samples that can be served for annotation right now.
+
+    Args:
+        dataset_id (int): The dataset id.
+
+    Returns:
+        list: The filter clauses.
+    """
+    return _qa_filters(dataset_id) + [Sample.islocked == False]
+
+
+def query_dataset_stats(dataset_id: int) -> dict:
+    """Get the annotated and not annotated sample counts of a dataset from its progress counters.
+
+    The total only counts the samples QA can serve, the ones of _qa_filters, so not_annotated is 0 once query_next_sample
+    has nothing left to serve but locked samples.
+
+    Args:
+        dataset_id (int): The dataset id.
+
+    Returns:
+        dict: The annotated, not_annotated and total counts.
+    """
+    progress = _progress_query(db.session, dataset_id).first()
+    if progress is None:
+        return {"annotated": 0, "not_annotated": 0, "total": 0}
+    return {"annotated": progress.n_annotated, "not_annotated": progress.n_ready - progress.n_annotated, "total": progress.n_ready}
+
+
+def query_next_sample(dataset_id: int) -> Tuple[Sample, dict]:
+    """Get the not yet annotated sample with the highest wer.
+
+    Args:
+        dataset_id (int): The dataset id to query the sample from.
+
+    Returns:
+        Tuple[Sample, dict]: The sample (None if there is nothing left to annotate) and the dataset stats.
+    """
+    # this should query the net sample with highest wer in which  there is no annotation yet by checking the annotation table
+
+    app_logger.debug(f"POSTGRES: Querying next sample for dataset {dataset_id}")
+    try:
+        # check if the dataset already exists
+        dataset = db.session.query(Dataset).filter(Dataset.id == dataset_id).first()
+        if not dataset:
+            raise ValueError(f"Dataset {dataset_id} does not exist")
+
+        # NOT EXISTS + LIMIT 1 lets postgres stop at the first unannotated row of the index instead of joining the whole dataset
+        # .filter(func.length(Sample.asr_text) - func.length(Sample.original_text) > 0.02 * func.length(Sample.original_text))
+        sample = db.session.query(Sample).filter(*_next_sample_filters(dataset_id)).filter(~_is_annotated()).order_by(Sample.wer.desc()).limit(1).first()
+        stats = query_dataset_stats(dataset_id)
+        return sample, stats
     except SQLAlchemyError as e:
         db.session.rollback()
         app_logger.error(f"Failed to query next sample. SQLAlchemyError: {e}")
@@ -965,67 +1378,188 @@ def correct_locked_times() -> bool:
         raise e
 
 
-def query_next_sample(dataset_id: int) -> Tuple[List[Sample], dict]:
-    """List all the samples in the database.
+def _claim_query(session_: Session, dataset_id: int, n: int):
+    # the next n servable samples, highest wer first, skipping the rows other transactions are claiming
+    return (
+        session_.query(Sample)
+        .filter(*_next_sample_filters(dataset_id))
+        .filter(~_is_annotated())
+        .order_by(Sample.wer.desc())
+        .limit(n)
+        .with_for_update(skip_locked=True, of=Sample)
+    )
+
+
+def _claim_samples(dataset_id: int, annotator_id: int, n: int) -> List[Sample]:
+    """Lock the next n samples for an annotator in the current transaction, the caller commits.
 
     Args:
-        dataset_id (int): The dataset id to list the samples from.
+        dataset_id (int): The dataset id to claim the samples from.
+        annotator_id (int): The annotator id that will own the locks.
+        n (int): The number of samples to claim.
 
     Returns:
-        List[Sample]: The list of samples.
+        List[Sample]: The claimed samples, highest wer first.
     """
-    correct_locked_times()
-    # this should query the net sample with highest wer in which  there is no annotation yet by checking the annotation table
+    if n == 0:
+        return []
+    samples = _claim_query(db.session, dataset_id, n).all()
+    locked_at, expires_at = func.now(), lease_expiry()
+    for sample in samples:
+        sample.islocked = True
+        sample.locked_at = locked_at
+        sample.locked_by = annotator_id
+        sample.expires_at = expires_at
+    return samples
+
 
-    app_logger.debug(f"POSTGRES: Listing samples for dataset {dataset_id}")
+def claim_batch(dataset_id: int, annotator_id: int, n: int) -> Tuple[List[Sample], dict]:
+    """Select and lock the next n samples for an annotator in a single transaction.
+
+    The candidate rows are taken with FOR UPDATE SKIP LOCKED, so concurrent annotators never receive the same sample
+    and do not wait on each other's row locks. Every claimed sample gets its own lock lease.
+
+    Args:
+        dataset_id (int): The dataset id to claim the samples from.
+        annotator_id (int): The annotator id that will own the locks.
+        n (int): The number of samples to claim.
+
+    Returns:
+        Tuple[List[Sample], dict]: The claimed samples, highest wer first, and the dataset stats.
+    """
+    app_logger.debug(f"POSTGRES: Claiming {n} samples of dataset {dataset_id} for annotator {annotator_id}")
     try:
+        if n < 1 or n > MAX_CLAIM_BATCH:
+            raise ValueError(f"The number of samples to claim should be between 1 and {MAX_CLAIM_BATCH}")
+
         # check if the dataset already exists
         dataset = db.session.query(Dataset).filter(Dataset.id == dataset_id).first()
         if not dataset:
             raise ValueError(f"Dataset {dataset_id} does not exist")
 
-        # join samples and annotations to get the next sample where wer>0.2
-        # the difference in  lenght of asr_tex and original text should be more than 5 percent of the original text
-        all = (
-            db.session.query(Sample, Annotation)
-            .outerjoin(Annotation, Sample.id == Annotation.sample_id)
-            .filter(Sample.dataset_id == dataset_id)
-            .filter(Sample.islocked != True)
-            .filter(Sample.is_selected_for_delivery == True)
-            # .filter(func.length(Sample.asr_text) - func.length(Sample.original_text) > 0.02 * func.length(Sample.original_text))
-            .filter(
-                not_(
-                    (Sample.local_trimmed_path == None)
-                    | (Sample.local_path == None)
-                    | (Sample.s3TrimmedPath == None)
-                    | (Sample.s3RawPath == None)
-                    | (Sample.asr_text == None)
-                    | (Sample.trimmed_audio_duration == None)
-                )
-            )
-            .order_by(Sample.wer.desc())
-            .all()
-        )
+        samples = _claim_samples(dataset_id, annotator_id, n)
+        db.session.commit()
+        stats = query_dataset_stats(dataset_id)
+        return samples, stats
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        app_logger.error(f"Failed to claim samples. SQLAlchemyError: {e}")
+        raise e
+    except Exception as e:
+        db.session.rollback()
+        app_logger.error(f"Failed to claim samples. Error: {e}")
+        raise e
+
 
-        # filter out the samples that have been annotated
-        samples = [sample for sample, annotation in all if annotation is None]
+def claim_next_sample(dataset_id: int, annotator_id: int) -> Tuple[Sample, dict]:
+    """Select and lock the next sample for an annotator in a single transaction.
 
-        # number of samples that have been annotated
-        annotated = len(all) - len(samples)
+    Args:
+        dataset_id (int): The dataset id to claim the sample from.
+        annotator_id (int): The annotator id that will own the lock.
 
-        # number of samples that have not been annotated
-        not_annotated = len(samples)
+    Returns:
+        Tuple[Sample, dict]: The claimed sample (None if there is nothing left to annotate) and the dataset stats.
+    """
+    samples, stats = claim_batch(dataset_id, annotator_id, 1)
+    return (samples[0] if samples else None), stats
 
-        if len(samples) == 0:
-            return None, {"annotated": annotated, "not_annotated": not_annotated, "total": annotated + not_annotated}
-        return samples[0], {"annotated": annotated, "not_annotated": not_annotated, "total": annotated + not_annotated}
+
+def annotate_and_claim(sample_id: int, annotator_id: int, n: int = 1, **annotation) -> Tuple[List[Sample], dict]:
+    """Annotate a sample, release its lease and claim the next samples of the dataset in a single transaction.
+
+    Args:
+        sample_id (int): The sample id to annotate.
+        annotator_id (int): The annotator id to annotate.
+        n (int): The number of samples to claim afterwards, 0 only annotates.
+        **annotation: The annotation fields, as in annotate_sample.
+
+    Returns:
+        Tuple[List[Sample], dict]: The claimed samples, highest wer first, and the dataset stats.
+    """
+    app_logger.debug(f"POSTGRES: Annotating sample {sample_id} and claiming {n} samples for annotator {annotator_id}")
+    try:
+        if n < 0 or n > MAX_CLAIM_BATCH:
+            raise ValueError(f"The number of samples to claim should be between 0 and {MAX_CLAIM_BATCH}")
+
+        sample = _add_annotation(sample_id, annotator_id, **annotation)
+        # flush so that the annotated sample is excluded from the claim below
+        db.session.flush()
+        samples = _claim_samples(sample.dataset_id, annotator_id, n)
+        db.session.commit()
+        stats = query_dataset_stats(sample.dataset_id)
+        return samples, stats
     except SQLAlchemyError as e:
         db.session.rollback()
-        app_logger.error(f"Failed to query next sample. SQLAlchemyError: {e}")
+        app_logger.error(f"Failed to annotate and claim. SQLAlchemyError: {e}")
         raise e
     except Exception as e:
         db.session.rollback()
-        app_logger.error(f"Failed to query next sample. Error: {e}")
+        app_logger.error(f"Failed to annotate and claim. Error: {e}")
+        raise e
+
+
+def _renew_locks_statement(dataset_id: int, annotator_id: int):
+    # extend the leases the annotator holds in the dataset, returning the ids of the renewed samples
+    return (
+        update(Sample)
+        .where(Sample.dataset_id == dataset_id, Sample.islocked == True, Sample.locked_by == annotator_id)
+        .values(expires_at=lease_expiry())
+        .returning(Sample.id)
+    )
+
+
+def renew_locks(dataset_id: int, annotator_id: int) -> List[int]:
+    """Extend the leases of all the samples an annotator holds in a dataset, e.g. a prefetched queue.
+
+    Args:
+        dataset_id (int): The dataset id.
+        annotator_id (int): The annotator id that holds the locks.
+
+    Returns:
+        List[int]: The ids of the samples still locked by the annotator.
+    """
+    app_logger.debug(f"POSTGRES: Renewing locks of annotator {annotator_id} in dataset {dataset_id}")
+    try:
+        sample_ids = db.session.execute(_renew_locks_statement(dataset_id, annotator_id)).scalars().all()
+        db.session.commit()
+        return sample_ids
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        app_logger.error(f"Failed to renew locks. SQLAlchemyError: {e}")
+        raise e
+    except Exception as e:
+        db.session.rollback()
+        app_logger.error(f"Failed to renew locks. Error: {e}")
+        raise e
+
+
+def release_locks(dataset_id: int, annotator_id: int) -> int:
+    """Release all the samples an annotator holds in a dataset.
+
+    Args:
+        dataset_id (int): The dataset id.
+        annotator_id (int): The annotator id that holds the locks.
+
+    Returns:
+        int: The number of released samples.
+    """
+    app_logger.debug(f"POSTGRES: Releasing locks of annotator {annotator_id} in dataset {dataset_id}")
+    try:
+        released = (
+            db.session.query(Sample)
+            .filter(Sample.dataset_id == dataset_id, Sample.islocked == True, Sample.locked_by == annotator_id)
+            .update({Sample.islocked: False, Sample.locked_by: None, Sample.expires_at: None}, synchronize_session=False)
+        )
+        db.session.commit()
+        return released
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        app_logger.error(f"Failed to release locks. SQLAlchemyError: {e}")
+        raise e
+    except Exception as e:
+        db.session.rollback()
+        app_logger.error(f"Failed to release locks. Error: {e}")
         raise e
 
 
@@ -1067,49 +1601,37 @@ def insert_sample(
         objectkey = os.path.join(dataset_dir, dataset_name, "raw", audio_path)
         local_path = os.path.join(str(paths.LOCAL_BUCKET_DIR.resolve()), objectkey)
         # preprocess the audio file
-        meta = evaluate_audio(audio_path)
-        with tempfile.TemporaryDirectory() as tmpdir:
-            filename = os.path.basename(audio_path)
-            # copy the file to the temp directory
-            shutil.copy(audio_path, local_path)
-            if meta["is_88khz"] == False:
-                convert_to_88k(local_path, local_path)
-
-            if meta["peak_volume_db"] < -6 or meta["peak_volume_db"] > -3:
-                normalize_audio(local_path, local_path)
-
-            if meta["isPCM"] == False:
-                convert_to_s16le(local_path, local_path)
-
-            meta = evaluate_audio(local_path)
-
-            sample = Sample(
-                dataset_id=dataset_id,
-                deliverable=deliverable,
-                filename=filename,
-                local_path=local_path,
-                original_text=text,
-                asr_text=None,
-                duration=meta["duration"],
-                trim_start=None,
-                trim_end=None,
-                trimmed_audio_duration=None,
-                sentence_type=sentence_type,
-                sentence_length=sentence_length,
-                sampling_rate=meta["sampling_rate"],
-                sample_format=meta["sample_format"],
-                isPCM=meta["isPCM"],
-                n_channel=meta["n_channel"],
-                format=meta["format"],
-                peak_volume_db=meta["peak_volume_db"],
-                size=meta["size"],
-                isValid=meta["isValid"],
-                wer=None,
-            )
+        filename = os.path.basename(audio_path)
+        meta = conform_audio(audio_path, local_path)
+
+        sample = Sample(
+            dataset_id=dataset_id,
+            deliverable=deliverable,
+            filename=filename,
+            local_path=local_path,
+            original_text=text,
+            asr_text=None,
+            duration=meta["duration"],
+            trim_start=None,
+            trim_end=None,
+            trimmed_audio_duration=None,
+            sentence_type=sentence_type,
+            sentence_length=sentence_length,
+            sampling_rate=meta["sampling_rate"],
+            sample_format=meta["sample_format"],
+            isPCM=meta["isPCM"],
+            n_channel=meta["n_channel"],
+            format=meta["format"],
+            peak_volume_db=meta["peak_volume_db"],
+            size=meta["size"],
+            isValid=meta["isValid"],
+            wer=None,
+        )
 
-            db.session.add(sample)
-            s3.upload_file(local_path, bucket_name, objectkey)
-            db.session.commit()
+        db.session.add(sample)
+        bump_dataset_progress(db.session, dataset_id, n_samples=1)
+        s3.upload_file(local_path, bucket_name, objectkey)
+        db.session.commit()
     except SQLAlchemyError as e:
         db.session.rollback()
         app_logger.error(f"Failed to query next sample. SQLAlchemyError: {e}")
@@ -1120,28 +1642,23 @@ def insert_sample(
         raise e
 
 
-from sqlalchemy.orm import Session
-
+def prepare_sample(row, dataset_id, filename, bucket_name, deliverable) -> dict:
+    """Conform the audio of an onboarding row to the delivery format and collect the fields of its sample.
 
-def upload_file(session_, row, dataset_id, filename, s3, bucket_name, deliverable):
-    # make sure that db is closed
+    Args:
+        row (pd.Series): The csv row with at least local_path, s3RawPath, text, sentence_type and sentence_length.
+        dataset_id (int): The dataset id the sample belongs to.
+        filename (str): The filename of the sample.
+        bucket_name (str): The s3 bucket of the raw audio.
+        deliverable (str): The deliverable of the sample.
 
-    meta = evaluate_audio(row["local_path"])
+    Returns:
+        dict: The column values of the sample.
+    """
     local_path = os.path.join(str(paths.LOCAL_BUCKET_DIR.resolve()), row["s3RawPath"])
-    # copy the file to the temp directory
-    shutil.copy(row["local_path"], local_path)
-    if meta["is_88khz"] == False:
-        convert_to_88k(row["local_path"], local_path)
-
-    if meta["peak_volume_db"] < -6 or meta["peak_volume_db"] > -3:
-        normalize_audio(local_path, local_path)
-
-    if meta["isPCM"] == False:
-        convert_to_s16le(local_path, local_path)
+    meta = conform_audio(row["local_path"], local_path)
 
-    meta = evaluate_audio(local_path)
-
-    sample = Sample(
+    return dict(
         dataset_id=dataset_id,
         deliverable=deliverable,
         filename=filename,
@@ -1167,61 +1684,161 @@ def upload_file(session_, row, dataset_id, filename, s3, bucket_name, deliverabl
         wer=None,
     )
 
-    session_.add(sample)
-    s3.upload_file(row["local_path"], bucket_name, row["s3RawPath"])
-    session_.commit()
+
+def insert_samples(session_: Session, dataset_id: int, samples: List[dict], chunk_size: int = 1000) -> int:
+    """Bulk insert a batch of onboarded samples and count them in the dataset progress, in one transaction.
+
+    Samples that already exist in the dataset, e.g. onboarded concurrently by another job, are skipped.
+
+    Args:
+        session_ (Session): The session to insert with, it is committed.
+        dataset_id (int): The dataset id of the samples.
+        samples (List[dict]): The column values of the samples, see prepare_sample.
+        chunk_size (int, optional): The number of rows per INSERT statement. Defaults to 1000.
+
+    Returns:
+        int: The number of inserted samples.
+    """
+    app_logger.debug(f"POSTGRES: Inserting {len(samples)} samples into dataset {dataset_id}")
+    try:
+        n_inserted = 0
+        for i in range(0, len(samples), chunk_size):
+            statement = (
+                pg_insert(Sample)
+                .values(samples[i : i + chunk_size])
+                .on_conflict_do_nothing(constraint="_dataset_id_filename_uc")
+                .returning(Sample.id)
+            )
+            n_inserted += len(session_.execute(statement).fetchall())
+        bump_dataset_progress(session_, dataset_id, n_samples=n_inserted)
+        session_.commit()
+        if n_inserted < len(samples):
+            app_logger.info(f"POSTGRES: {len(samples) - n_inserted} samples already existed in dataset {dataset_id}")
+        return n_inserted
+    except Exception as e:
+        session_.rollback()
+        app_logger.error(f"Failed to insert samples. Error: {e}")
+        raise e
 
 
 def upload_wav_samples(job: Task, session_: Session, dataset_id: int, csv_path: str, deliverable: str):
+    """Onboard the samples of a csv into a dataset.
+
+    The rows go through a pipeline: the audio is conformed on a pool of ONBOARDING_WORKERS threads, the raw audio is
+    uploaded to s3 on a separate pool of ONBOARDING_UPLOAD_WORKERS threads, and the samples are inserted in batches of
+    ONBOARDING_BATCH_SIZE from the calling thread, which owns the session. A stage only receives new rows while the next
+    one keeps up, so at most twice the pool size of rows are in flight per stage whatever the size of the csv.
 
+    Args:
+        job (Task): The celery task to report the progress to, None when run synchronously.
+        session_ (Session): The session to insert the samples with.
+        dataset_id (int): The dataset id to onboard the samples into.
+        csv_path (str): The csv with the file_name, local_path, text, sentence_type and sentence_length columns.
+        deliverable (str): The deliverable of the samples.
+    """
     # get dataset
     dataset = session_.query(Dataset).filter(Dataset.id == dataset_id).first()
     if not dataset:
         raise ValueError(f"Dataset {dataset_id} does not exist")
-    dataset = session_.query(Dataset).filter(Dataset.id == dataset_id).first()
     session_.commit()
     dataset_name = dataset.name
     bucket_name = os.environ.get("S3_BUCKET_NAME")
     dataset_dir = os.environ.get("S3_DATASET_DIR")
+    n_workers = int(os.environ.get("ONBOARDING_WORKERS") or os.cpu_count())
+    n_upload_workers = int(os.environ.get("ONBOARDING_UPLOAD_WORKERS", 16))
+    batch_size = int(os.environ.get("ONBOARDING_BATCH_SIZE", 2000))
 
     print("CSV_PATH: ", csv_path)
     print("My current working directory: ", os.getcwd())
-    # Simulate a long-running process
     df = pd.read_csv(csv_path)
 
     df["s3RawPath"] = df["file_name"].apply(lambda x: os.path.join(dataset_dir, dataset_name, "raw", x))
 
-    s3 = boto3.client("s3", aws_access_key_id=os.environ.get("AWS_ACCESS_KEY_ID"), aws_secret_access_key=os.environ.get("AWS_SECRET_ACCESS_KEY"))
+    s3 = boto3.client(
+        "s3",
+        aws_access_key_id=os.environ.get("AWS_ACCESS_KEY_ID"),
+        aws_secret_access_key=os.environ.get("AWS_SECRET_ACCESS_KEY"),
+        config=botocore.config.Config(max_pool_connections=n_upload_workers),
+    )
 
-    # Check if the dataset already exists
-    dataset = session_.query(Dataset).filter(Dataset.id == dataset_id).first()
-    if not dataset:
-        raise ValueError(f"Dataset {dataset_id} does not exist")
     failed: List[str] = []
-    # get_metadata of each sample using evaluate_audio method that return dict
+    pending: List[dict] = []
     progress = tqdm(total=len(df), desc="Processing")
-    for i, row in df.iterrows():
+    last_percentage = -1
+
+    def report():
+        nonlocal last_percentage
+        percentage = int(progress.n / progress.total * 100) if progress.total else 100
+        if job and percentage != last_percentage:
+            job.update_state(state="PROGRESS", meta={"progress": percentage, "onboarded_samples": progress.n - len(failed), "failed_samples": failed})
+        last_percentage = percentage
+
+    def fail(row, e):
+        app_logger.error(f"POSTGRES: Error uploading sample {row['file_name']}: {e}")
+        failed.append(row["file_name"])
         progress.update(1)
-        percentage = int(progress.n / progress.total * 100)
+
+    def flush():
         try:
+            insert_samples(session_, dataset_id, pending)
+        except Exception as e:
+            failed.extend(os.path.basename(sample["local_path"]) for sample in pending)
+            app_logger.error(f"POSTGRES: Error inserting {len(pending)} samples: {e}")
+        progress.update(len(pending))
+        pending.clear()
+
+    # the filenames already onboarded, loaded once instead of queried per row
+    existing = {filename for (filename,) in session_.query(Sample.filename).filter(Sample.dataset_id == dataset_id)}
+    session_.commit()
+
+    rows = (row for _, row in df.iterrows())
+    # future -> row of the audio stage, future -> (row, sample) of the upload stage
+    prepare_futures: dict = {}
+    upload_futures: dict = {}
+
+    def feed():
+        # backpressure: stop reading rows while either stage is saturated
+        while len(prepare_futures) < 2 * n_workers and len(upload_futures) < 2 * n_upload_workers:
+            row = next(rows, None)
+            if row is None:
+                return
             filename = os.path.basename(row["local_path"])
             # if there is file in the database with the same name and dataset id then skip it
-            sample = session_.query(Sample).filter(Sample.filename == filename).filter(Sample.dataset_id == dataset_id).first()
-            if sample:
+            if filename in existing:
                 app_logger.debug(f"POSTGRES: Sample {filename} already exists in dataset {dataset_id}")
+                progress.update(1)
                 continue
-            # run with thread pool
-            with ThreadPoolExecutor(max_workers=10) as executor:
-                future = executor.submit(upload_file, session_, row, dataset_id, filename, s3, bucket_name, deliverable)
-                future.result()
-            if job:
-                job.update_state(state="PROGRESS", meta={"progress": percentage, "onboarded_samples": progress.n - len(failed), "failed_samples": failed})
-        except Exception as e:
-            app_logger.error(f"POSTGRES: Error uploading sample {row['file_name']}: {e}")
-            failed.append(row["file_name"])
-            if job:
-                job.update_state(state="PROGRESS", meta={"progress": percentage, "onboarded_samples": progress.n - len(failed), "failed_samples": failed})
-            continue
+            existing.add(filename)
+            prepare_futures[prepare_pool.submit(prepare_sample, row, dataset_id, filename, bucket_name, deliverable)] = row
+
+    with ThreadPoolExecutor(max_workers=n_workers) as prepare_pool, ThreadPoolExecutor(max_workers=n_upload_workers) as upload_pool:
+        feed()
+        while prepare_futures or upload_futures:
+            done, _ = wait(list(prepare_futures) + list(upload_futures), return_when=FIRST_COMPLETED)
+            for future in done:
+                if future in prepare_futures:
+                    row = prepare_futures.pop(future)
+                    try:
+                        sample = future.result()
+                    except Exception as e:
+                        fail(row, e)
+                        continue
+                    upload_futures[upload_pool.submit(s3.upload_file, row["local_path"], bucket_name, row["s3RawPath"])] = (row, sample)
+                else:
+                    row, sample = upload_futures.pop(future)
+                    try:
+                        future.result()
+                    except Exception as e:
+                        fail(row, e)
+                        continue
+                    pending.append(sample)
+                    if len(pending) >= batch_size:
+                        flush()
+            feed()
+            report()
+        if pending:
+            flush()
+            report()
     progress.close()
     # remove folder that contains csv file
     shutil.rmtree(os.path.dirname(csv_path))
@@ -0,0 +1,87 @@
+import os
+import threading
+from typing import Any, Callable, Dict
+
+from src.logger import root_logger
+
+
+app_logger = root_logger.getChild("registry")
+
+
+class ModelRegistry:
+    """Thread safe registry of models that are only built on first use.
+
+    Loading a model can take tens of seconds and network calls, so modules register a factory at import time instead
+    of the model itself. Long running processes can build the models they need upfront with warm_up.
+    """
+
+    def __init__(self):
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._models: Dict[str, Any] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, factory: Callable[[], Any]) -> None:
+        """Register the factory of a model.
+
+        Args:
+            name (str): The name of the model.
+            factory (Callable[[], Any]): Builds the model, called once on first use.
+        """
+        with self._lock:
+            self._factories[name] = factory
+            self._locks.setdefault(name, threading.Lock())
+
+    def get(self, name: str) -> Any:
+        """Get a model, building it if it is not loaded yet.
+
+        Concurrent callers of a model being built wait for it instead of building it again.
+
+        Args:
+            name (str): The name of the model.
+
+        Returns:
+            Any: The model.
+        """
+        model = self._models.get(name)
+        if model is not None:
+            return model
+        if name not in self._factories:
+            raise KeyError(f"Model {name} is not registered")
+        with self._locks[name]:
+            if name not in self._models:
+                app_logger.info(f"Loading model {name}")
+                self._models[name] = self._factories[name]()
+            return self._models[name]
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._models
+
+    def unload(self, name: str) -> None:
+        with self._locks[name]:
+            self._models.pop(name, None)
+
+    def names(self) -> list:
+        return list(self._factories)
+
+    def warm_up(self, *names: str) -> None:
+        """Build models now rather than on first use.
+
+        Args:
+            *names (str): The names of the models, all the registered models matching a prefix ending with "*" too.
+        """
+        for name in names:
+            if name.endswith("*"):
+                self.warm_up(*[registered for registered in self.names() if registered.startswith(name[:-1])])
+            elif name:
+                self.get(name)
+
+
+# the models are registered by the modules defining them, e.g. src.utils.audio
+models = ModelRegistry()
+
+
+def warm_up_from_env(variable: str = "WARM_UP_MODELS") -> None:
+    # comma separated model names, e.g. WARM_UP_MODELS=vad,asr_client
+    names = [name.strip() for name in os.environ.get(variable, "").split(",")]
+    models.warm_up(*[name for name in names if name])
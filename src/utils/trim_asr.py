@@ -5,21 +5,25 @@ import traceback
 logging.basicConfig(level=logging.DEBUG)
 import os
 
-import librosa
 from tqdm import tqdm
 
 from src.paths import paths
 from dotenv import find_dotenv, load_dotenv
 load_dotenv(find_dotenv(paths.PROJECT_ROOT_DIR / "vars.env"), override=True)
 
+import argparse
+import socket
 import sys
-from concurrent.futures import as_completed, ThreadPoolExecutor  # noqa: F401
+import time
+from concurrent.futures import as_completed, FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait  # noqa: F401
+from datetime import timedelta
 from pathlib import Path
 
 import boto3
 import botocore
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import sessionmaker
 
 
@@ -28,9 +32,11 @@ sys.path.append(str(Path(__file__).resolve().parents[2]))
 
 from src.logger import root_logger
 from src.paths import paths
-from src.service.models import Annotation, Annotator, Base, Dataset, Sample  # noqa: F401
+from src.service.models import Annotation, Annotator, Base, Dataset, Sample, SampleJob  # noqa: F401
 from src.utils import utils
-from src.utils.audio import asr_and_trim_aws, asr_and_trim_azure, asr_aws, trim_audio, trim_only
+from src.utils.audio import aws_transcription, HYPER_PARAMETERS, submit_asr, trim_audio, trim_only
+from src.utils.db_utils import bump_dataset_progress, count_qa_samples
+from src.utils.registry import models
 
 
 app_logger = root_logger.getChild("trimmer")
@@ -93,174 +99,381 @@ def wer_wo_punctuation(reference, hypothesis):
     return uncased_unpunctuated_wer
 
 
-def asr_and_trim_(session_, sample, language, use="azure"):
-    if use == "azure":
-        response = asr_and_trim_azure(sample.s3RawPath, language)
-    elif use == "aws":
-        response = asr_and_trim_aws(sample.s3RawPath, language)
+def trim_(local_path, timeline=None):
+    # cpu stage, runs in the process pool: vad, trim and upload of the trimmed audio of one sample
+    response = trim_only(local_path, timeline)
 
     start = float(response["trim_start"]) - offset
     end = float(response["trim_end"]) + offset
-    out_path, start, end = trim_audio(sample.local_path, start, end, sample.local_path.replace("raw", "trimmed"))
-
-    sample.trim_start = round(float(start), 2)
-    sample.trim_end = round(float(end), 2)
-    sample.trimmed_audio_duration = round(float(end - start), 2)
-    sample.longest_pause = round(float(response["longest_pause"]), 2)
-    sample.asr_text = str(response["asr_text"])
-    sample.wer = round(float(utils.calculate_wer(sample.original_text.lower(), sample.asr_text.lower())), 2)
-
-    # update sample
-    object_key = out_path.split(f"{str(paths.LOCAL_BUCKET_DIR)}/")[1]
-    s3TrimmedPath = f"s3://{bucket_name}/{object_key}"
-
-    sample.local_trimmed_path = out_path
-    sample.s3TrimmedPath = str(s3TrimmedPath)
-    session_.add(sample)
-    s3.upload_file(out_path, bucket_name, object_key)
-    session_.commit()
-
-
-def trim_only_(session_, sample, language):
-    response = trim_only(sample.local_path)
-
-    start = float(response["trim_start"]) - offset
-    end = float(response["trim_end"]) + offset
-    out_path, start, end = trim_audio(sample.local_path, start, end, sample.local_path.replace("raw", "trimmed"))
-
-    sample.trim_start = round(float(start), 2)
-    sample.trim_end = round(float(end), 2)
-    sample.trimmed_audio_duration = round(float(end - start), 2)
-    sample.longest_pause = round(float(response["longest_pause"]), 2)
-    sample.wer = round(float(utils.calculate_wer(sample.original_text.lower(), sample.asr_text.lower())), 2)
-    # update sample
-    object_key = out_path.split(f"{str(paths.LOCAL_BUCKET_DIR)}/")[1]
-    s3TrimmedPath = f"s3://{bucket_name}/{object_key}"
-
-    sample.local_trimmed_path = out_path
-    sample.s3TrimmedPath = str(s3TrimmedPath)
-    session_.add(sample)
-    s3.upload_file(out_path, bucket_name, object_key)
-    session_.commit()
-
-
-def trim_and_asr_(sample, language):
-    response = trim_only(sample.local_path)
-
-    start = float(response["trim_start"]) - offset
-    end = float(response["trim_end"]) + offset
-    out_path, start, end = trim_audio(sample.local_path, start, end, sample.local_path.replace("raw", "trimmed"))
-
-    # update sample
+    out_path, start, end = trim_audio(local_path, start, end, local_path.replace("raw", "trimmed"))
     object_key = out_path.split(f"{str(paths.LOCAL_BUCKET_DIR)}/")[1]
-    s3TrimmedPath = f"s3://{bucket_name}/{object_key}"
-
-    sample.local_trimmed_path = out_path
-    sample.s3TrimmedPath = str(s3TrimmedPath)
-
     s3.upload_file(out_path, bucket_name, object_key)
-
-    asr = asr_aws(str(s3TrimmedPath), language)
-    sample.asr_text = str(asr)
-    sample.trim_start = round(float(start), 2)
-    sample.trim_end = round(float(end), 2)
-    sample.trimmed_audio_duration = round(float(end - start), 2)
-    sample.longest_pause = round(float(response["longest_pause"]), 2)
-    sample.wer = round(float(utils.calculate_wer(sample.original_text.lower(), str(asr).lower())), 2)
-    sample.uncased_unpunctuated_wer = round(float(wer_wo_punctuation(sample.original_text.lower(), str(asr).lower())), 2)
-    return sample
-
-
-def asr_only_(sample, language):
-    asr = asr_aws(sample.s3TrimmedPath, language)
-    sample.asr_text = str(asr)
-    # get duration
-    sample.trimmed_audio_duration = librosa.get_duration(filename=sample.local_trimmed_path)
-    sample.wer = round(float(utils.calculate_wer(sample.original_text.lower(), str(asr).lower())), 2)
-    sample.uncased_unpunctuated_wer = round(float(wer_wo_punctuation(sample.original_text.lower(), str(asr).lower())), 2)
-    return sample
-
-
-def process_datasets():
-    datasets = session.query(Dataset).all()
-    for dataset in datasets:
-        if "English (Alyssa)" in dataset.name:
-            continue
-        print(f"Processing dataset: {dataset.name}")
-        app_logger.info(f"Processing dataset: {dataset.name}")
-
-        language = dataset.language
-
-        samples = (
-            session.query(Sample)
-            .filter(Sample.dataset_id == dataset.id)
-            .filter(
-                (Sample.local_trimmed_path == None)
-                | (Sample.local_path == None)
-                | (Sample.s3TrimmedPath == None)
-                | (Sample.s3RawPath == None)
-                | (Sample.asr_text == None)
-                | (Sample.trim_start == None)
-                | (Sample.trim_end == None)
-                | (Sample.trimmed_audio_duration == None)
-                | (Sample.trimmed_audio_duration == 0)
-                | (Sample.longest_pause == None)
-                | (Sample.wer == None)
-            )
-            .all()
+    return {
+        "local_trimmed_path": out_path,
+        "s3TrimmedPath": f"s3://{bucket_name}/{object_key}",
+        "trim_start": round(float(start), 2),
+        "trim_end": round(float(end), 2),
+        "trimmed_audio_duration": round(float(end - start), 2),
+        "longest_pause": round(float(response["longest_pause"]), 2),
+    }
+
+
+def trim_batch(local_paths):
+    # runs in the process pool: one batched vad pass over the samples, then the trim of each of them.
+    # a failed sample gets its error in place of its result, so that it only fails its own job
+    try:
+        timelines = models.get("batched_vad").run(local_paths)
+    except Exception:
+        # e.g. an unreadable file, the samples then run their vad one by one
+        app_logger.error(f"Error running the vad of {len(local_paths)} samples: traceback: {traceback.format_exc()}")
+        timelines = [None] * len(local_paths)
+    results = []
+    for local_path, timeline in zip(local_paths, timelines):
+        try:
+            results.append(trim_(local_path, timeline))
+        except Exception as e:
+            app_logger.error(f"Error trimming {local_path}: traceback: {traceback.format_exc()}")
+            # the error is sent back to the parent process, not every exception can be pickled
+            results.append(RuntimeError(f"{type(e).__name__}: {e}"))
+    return results
+
+
+def asr_result(fields, details, original_text):
+    # the asr fields of a sample from the details of the aws model
+    asr = aws_transcription(details)
+    return dict(
+        fields,
+        asr_text=str(asr),
+        wer=round(float(utils.calculate_wer(original_text.lower(), str(asr).lower())), 2),
+        uncased_unpunctuated_wer=round(float(wer_wo_punctuation(original_text.lower(), str(asr).lower())), 2),
+    )
+
+
+def init_trim_worker(torch_threads):
+    # every process runs its own vad over the batches of samples it is given by trim_batch, it never waits for other
+    # files to batch with. a vad inherited from the parent would also have lost its batching thread in the fork
+    from src.utils.vad import BatchedVAD
+
+    # nor are the connections of the s3 client safe to share with the parent
+    global s3
+    s3 = boto3.client(
+        "s3", aws_access_key_id=os.environ.get("AWS_ACCESS_KEY_ID"), aws_secret_access_key=os.environ.get("AWS_SECRET_ACCESS_KEY"), config=client_config
+    )
+    models.unload("batched_vad")
+    models.register("batched_vad", lambda: BatchedVAD(models.get("segmentation"), max_wait=0, num_threads=torch_threads, **HYPER_PARAMETERS))
+    models.warm_up("batched_vad")
+
+
+# the job of a sample is retried max_attempts times, backoff_sec * 2 ** (attempts - 1) apart, capped at MAX_BACKOFF_SEC
+MAX_BACKOFF_SEC = 3600
+worker_id = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def incomplete_samples_filter():
+    return (
+        (Sample.local_trimmed_path == None)
+        | (Sample.local_path == None)
+        | (Sample.s3TrimmedPath == None)
+        | (Sample.s3RawPath == None)
+        | (Sample.asr_text == None)
+        | (Sample.trim_start == None)
+        | (Sample.trim_end == None)
+        | (Sample.trimmed_audio_duration == None)
+        | (Sample.trimmed_audio_duration == 0)
+        | (Sample.longest_pause == None)
+        | (Sample.wer == None)
+    )
+
+
+def enqueue_samples(dataset_id):
+    # one job per incomplete sample, the samples that already have one keep its state
+    samples = session.query(Sample.id).filter(Sample.dataset_id == dataset_id).filter(incomplete_samples_filter())
+    statement = pg_insert(SampleJob).from_select(["sample_id"], samples.statement).on_conflict_do_nothing()
+    n_jobs = session.execute(statement).rowcount
+    session.commit()
+    return n_jobs
+
+
+def claim_jobs(dataset_id, n, lease_min):
+    """Claim the next n due jobs of a dataset for this worker.
+
+    The rows are taken with FOR UPDATE SKIP LOCKED and leased for lease_min minutes, so several workers, possibly on
+    different machines, never process the same sample. A job whose worker died is claimable again once its lease ends.
+    The times are taken from the database clock, the one all the workers share.
+    """
+    now = func.now()
+    jobs = (
+        session.query(
+            SampleJob.sample_id,
+            SampleJob.stage,
+            SampleJob.attempts,
+            Sample.local_path,
+            Sample.local_trimmed_path,
+            Sample.s3TrimmedPath,
+            Sample.original_text,
         )
-        # if len(samples) > 0:
-        #     whisper_model.unload()
-        #     whisper_model.load(language=lang_map[language])
-        while samples:
-            with ThreadPoolExecutor(max_workers=32) as executor:
-                futures = [executor.submit(trim_and_asr_, sample, language) for sample in samples]
-
-                # Use tqdm to display the progress of processing finished samples
-                for future in tqdm(as_completed(futures), total=len(futures), desc="Processing samples"):
-                    try:
-                        sample = future.result()
-                        # Detach the sample from the main session
-                        session.expunge(sample)
-
-                        # Create a new temporary session
-                        Session = sessionmaker(bind=engine)
-                        tmp_session = Session()
-
-                        # Add the sample to the temporary session and commit the changes
-                        tmp_session.add(sample)
-                        tmp_session.commit()
-
-                        # Close the temporary session
-                        tmp_session.close()
-                    except Exception as e:
-                        app_logger.error(f"Error processing sample: traceback: {traceback.format_exc()}")
-
-            # get samples with asr_text = null
-            samples = (
-                session.query(Sample)
-                .filter(Sample.dataset_id == dataset.id)
-                .filter(
-                    (Sample.local_trimmed_path == None)
-                    | (Sample.local_path == None)
-                    | (Sample.s3TrimmedPath == None)
-                    | (Sample.s3RawPath == None)
-                    | (Sample.asr_text == None)
-                    | (Sample.trim_start == None)
-                    | (Sample.trim_end == None)
-                    | (Sample.trimmed_audio_duration == None)
-                    | (Sample.trimmed_audio_duration == 0)
-                    | (Sample.longest_pause == None)
-                    | (Sample.wer == None)
+        .join(Sample, Sample.id == SampleJob.sample_id)
+        .filter(Sample.dataset_id == dataset_id)
+        .filter(SampleJob.stage.in_(["pending", "trimmed"]))
+        .filter(SampleJob.next_retry_at <= now)
+        .filter((SampleJob.lease_until == None) | (SampleJob.lease_until < now))
+        .order_by(SampleJob.next_retry_at)
+        .limit(n)
+        .with_for_update(skip_locked=True, of=SampleJob)
+        .all()
+    )
+    if jobs:
+        session.query(SampleJob).filter(SampleJob.sample_id.in_([job.sample_id for job in jobs])).update(
+            {SampleJob.claimed_by: worker_id, SampleJob.lease_until: func.now() + timedelta(minutes=lease_min)}, synchronize_session=False
+        )
+    session.commit()
+    return jobs
+
+
+def failed_job(job, stage, error, max_attempts, backoff_sec):
+    # next_retry_at is set by write_results from the database clock, backoff seconds from now
+    attempts = job.attempts + 1
+    return {
+        "sample_id": job.sample_id,
+        "stage": "failed" if attempts >= max_attempts else stage,
+        "attempts": attempts,
+        "last_error": str(error)[:500],
+        "backoff": min(backoff_sec * 2 ** (attempts - 1), MAX_BACKOFF_SEC),
+        "claimed_by": None,
+        "lease_until": None,
+    }
+
+
+def commit_results(sample_updates, job_updates):
+    # the samples and the state of their jobs in one transaction, the samples that become servable by QA are counted
+    # in the progress of their dataset
+    sample_ids = [update["id"] for update in sample_updates]
+    n_ready_before = count_qa_samples(session, sample_ids)
+    session.bulk_update_mappings(Sample, sample_updates)
+    session.bulk_update_mappings(SampleJob, [update for update in job_updates if "backoff" not in update])
+    for update in job_updates:
+        if "backoff" in update:
+            values = {key: value for key, value in update.items() if key not in ("sample_id", "backoff")}
+            values["next_retry_at"] = func.now() + timedelta(seconds=update["backoff"])
+            session.query(SampleJob).filter(SampleJob.sample_id == update["sample_id"]).update(values, synchronize_session=False)
+    n_ready_after = count_qa_samples(session, sample_ids)
+    for dataset_id in set(n_ready_before) | set(n_ready_after):
+        n_ready = n_ready_after.get(dataset_id, 0) - n_ready_before.get(dataset_id, 0)
+        if n_ready:
+            bump_dataset_progress(session, dataset_id, n_ready=n_ready)
+    session.commit()
+
+
+def write_results(sample_updates, job_updates, jobs, max_attempts, backoff_sec):
+    """Checkpoint a batch of results from the single writer, in one transaction.
+
+    If the batch fails, its jobs are written one by one so that a bad row only costs its own job: the job whose
+    results can not be written is recorded as a failed attempt, the results of the others are kept.
+
+    Args:
+        sample_updates (list): The updates of the samples, keyed by id.
+        job_updates (list): The updates of their jobs, keyed by sample_id.
+        jobs (dict): The claimed jobs keyed by sample id.
+        max_attempts (int): The attempts before a job is marked as failed.
+        backoff_sec (float): The delay before the first retry.
+    """
+    try:
+        commit_results(sample_updates, job_updates)
+    except Exception:
+        session.rollback()
+        app_logger.error(f"Error writing {len(job_updates)} jobs, writing them one by one: traceback: {traceback.format_exc()}")
+        for sample_id in dict.fromkeys(update["sample_id"] for update in job_updates):
+            try:
+                commit_results(
+                    [update for update in sample_updates if update["id"] == sample_id],
+                    [update for update in job_updates if update["sample_id"] == sample_id],
                 )
-                .all()
+            except Exception as e:
+                session.rollback()
+                app_logger.error(f"Error writing sample {sample_id}: traceback: {traceback.format_exc()}")
+                job = jobs[sample_id]
+                try:
+                    commit_results([], [failed_job(job, job.stage, e, max_attempts, backoff_sec)])
+                except Exception:
+                    session.rollback()
+                    app_logger.error(f"Error recording the failure of sample {sample_id}, it is retried once its lease ends")
+    sample_updates.clear()
+    job_updates.clear()
+
+
+def process_jobs(jobs, language, trim_pool, trim_workers, batch_size, trim_batch_size, max_attempts, backoff_sec):
+    """Trim and transcribe the samples of claimed jobs through the hybrid pipeline.
+
+    The vad, trim and upload run in the process pool over batches of trim_batch_size samples, so that the windows of
+    the samples of a batch share the forward passes of the vad. The asr requests run on the event loop of the asr
+    client, within the concurrency limit of the provider, and the results are written in batches of batch_size from
+    this thread. The trim is checkpointed, a job claimed in the trimmed stage only runs the asr. Jobs are only
+    submitted while the process pool and the asr client have at most twice their size in flight.
+    """
+    rows = iter(jobs)
+    jobs_by_id = {job.sample_id: job for job in jobs}
+    trim_futures, asr_futures, sample_updates, job_updates = {}, {}, [], []
+    max_asr_futures = 2 * models.get("asr_client").concurrency.get("aws", 8)
+    progress = tqdm(total=len(jobs), desc="Processing samples")
+
+    def queue_asr(job, fields):
+        asr_futures[submit_asr("aws", fields["s3TrimmedPath"], language, local_path=fields["local_trimmed_path"])] = (job, fields)
+
+    def fail(job, stage, error):
+        job_updates.append(failed_job(job, stage, error, max_attempts, backoff_sec))
+        progress.update(1)
+
+    def feed():
+        while len(trim_futures) < 2 * trim_workers and len(asr_futures) < max_asr_futures:
+            batch = []
+            for job in rows:
+                # the trims checkpointed before the upload moved to the trim stage have no s3 path, they run again
+                if job.stage == "trimmed" and job.s3TrimmedPath is not None:
+                    queue_asr(job, {"local_trimmed_path": job.local_trimmed_path, "s3TrimmedPath": job.s3TrimmedPath})
+                else:
+                    batch.append(job)
+                if len(batch) == trim_batch_size or len(asr_futures) >= max_asr_futures:
+                    break
+            if not batch:
+                return
+            trim_futures[trim_pool.submit(trim_batch, [job.local_path for job in batch])] = batch
+
+    def write_if_full():
+        if len(job_updates) >= batch_size:
+            write_results(sample_updates, job_updates, jobs_by_id, max_attempts, backoff_sec)
+
+    feed()
+    while trim_futures or asr_futures:
+        done, _ = wait(list(trim_futures) + list(asr_futures), return_when=FIRST_COMPLETED)
+        for future in done:
+            if future in trim_futures:
+                batch = trim_futures.pop(future)
+                try:
+                    results = future.result()
+                except Exception as e:
+                    # e.g. a worker process that died, the whole batch is retried
+                    app_logger.error(f"Error trimming {len(batch)} samples: traceback: {traceback.format_exc()}")
+                    results = [e] * len(batch)
+                for job, result in zip(batch, results):
+                    if isinstance(result, Exception):
+                        fail(job, "pending", result)
+                        continue
+                    # checkpoint the trim and keep the lease, the asr stage follows
+                    sample_updates.append(dict(result, id=job.sample_id))
+                    job_updates.append({"sample_id": job.sample_id, "stage": "trimmed"})
+                    queue_asr(job, result)
+                write_if_full()
+                continue
+            # a failed asr is retried from the trimmed audio
+            job, fields = asr_futures.pop(future)
+            try:
+                result = asr_result(fields, future.result(), job.original_text)
+            except Exception as e:
+                app_logger.error(f"Error processing sample {job.sample_id}: traceback: {traceback.format_exc()}")
+                fail(job, "trimmed", e)
+                continue
+            sample_updates.append(dict(result, id=job.sample_id))
+            job_updates.append({"sample_id": job.sample_id, "stage": "done", "last_error": None, "claimed_by": None, "lease_until": None})
+            progress.update(1)
+            write_if_full()
+        feed()
+    if job_updates:
+        write_results(sample_updates, job_updates, jobs_by_id, max_attempts, backoff_sec)
+    progress.close()
+
+
+def process_dataset(dataset, trim_pool, trim_workers, batch_size, trim_batch_size, chunk_size, lease_min, max_attempts, backoff_sec):
+    # claims and processes the jobs of the dataset until none is due
+    while True:
+        jobs = claim_jobs(dataset.id, chunk_size, lease_min)
+        if not jobs:
+            return
+        # start the asr client before the workers so they do not all wait on the first sample
+        models.warm_up("asr_client")
+        process_jobs(jobs, dataset.language, trim_pool, trim_workers, batch_size, trim_batch_size, max_attempts, backoff_sec)
+
+
+def seconds_to_next_retry(dataset_id):
+    # None once the dataset has no job left to retry. the jobs leased by other workers are theirs to finish, the ones
+    # whose lease expired, e.g. after a worker crash, are claimable as in claim_jobs once their retry time has passed
+    now = func.now()
+    due_at = func.greatest(SampleJob.next_retry_at, func.coalesce(SampleJob.lease_until, SampleJob.next_retry_at))
+    seconds = (
+        session.query(func.extract("epoch", func.min(due_at) - now))
+        .join(Sample, Sample.id == SampleJob.sample_id)
+        .filter(Sample.dataset_id == dataset_id, SampleJob.stage.in_(["pending", "trimmed"]))
+        .filter((SampleJob.lease_until == None) | (SampleJob.lease_until < now))
+        .scalar()
+    )
+    session.commit()
+    return None if seconds is None else float(seconds)
+
+
+def process_datasets(
+    trim_workers=os.cpu_count(),
+    batch_size=100,
+    trim_batch_size=16,
+    torch_threads=1,
+    chunk_size=500,
+    lease_min=30,
+    max_attempts=5,
+    backoff_sec=30,
+):
+    datasets = session.query(Dataset).all()
+    with ProcessPoolExecutor(max_workers=trim_workers, initializer=init_trim_worker, initargs=(torch_threads,)) as trim_pool:
+        # a pass drains the due jobs of every dataset. the datasets left with retries due later are passed over
+        # again once the earliest of them is due, so a failing sample never holds back the datasets after it
+        datasets = [dataset for dataset in datasets if "English (Alyssa)" not in dataset.name]
+        for dataset in datasets:
+            app_logger.info(f"Enqueued {enqueue_samples(dataset.id)} samples of {dataset.name}")
+        while datasets:
+            for dataset in datasets:
+                print(f"Processing dataset: {dataset.name}")
+                app_logger.info(f"Processing dataset: {dataset.name}")
+                process_dataset(dataset, trim_pool, trim_workers, batch_size, trim_batch_size, chunk_size, lease_min, max_attempts, backoff_sec)
+                app_logger.info(f"Finished processing dataset: {dataset.name}")
+
+            retry_in = {dataset.id: seconds_to_next_retry(dataset.id) for dataset in datasets}
+            datasets = [dataset for dataset in datasets if retry_in[dataset.id] is not None]
+            if datasets:
+                wait_sec = max(1, min(retry_in[dataset.id] for dataset in datasets))
+                app_logger.info(f"{len(datasets)} datasets have samples to retry, next pass in {wait_sec:.0f} seconds")
+                time.sleep(wait_sec)
+
+        for dataset in session.query(Dataset).all():
+            n_failed = (
+                session.query(SampleJob)
+                .join(Sample, Sample.id == SampleJob.sample_id)
+                .filter(Sample.dataset_id == dataset.id, SampleJob.stage == "failed")
+                .count()
             )
-
-        app_logger.info(f"Finished processing dataset: {dataset.name}")
+            if n_failed:
+                app_logger.warning(f"{n_failed} samples of {dataset.name} failed {max_attempts} times, see sample_job.last_error")
+        session.commit()
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Trim and transcribe the samples of all the datasets")
+    parser.add_argument("--trim-workers", type=int, default=os.cpu_count(), help="processes running the vad and trim")
+    parser.add_argument("--batch-size", type=int, default=100, help="samples written per transaction")
+    parser.add_argument("--trim-batch-size", type=int, default=16, help="samples sharing the vad forward passes of a trim process")
+    parser.add_argument("--torch-threads", type=int, default=1, help="torch threads of each trim process")
+    parser.add_argument("--chunk-size", type=int, default=500, help="jobs claimed at once")
+    parser.add_argument("--lease-min", type=float, default=30, help="minutes before the claimed jobs of a dead worker are claimable again")
+    parser.add_argument("--max-attempts", type=int, default=5, help="attempts before a sample is marked as failed")
+    parser.add_argument("--backoff-sec", type=float, default=30, help="delay before the first retry, doubled on every attempt")
+    args = parser.parse_args()
+
     app_logger.info("Starting to process all datasets")
-    process_datasets()
+    process_datasets(
+        trim_workers=args.trim_workers,
+        batch_size=args.batch_size,
+        trim_batch_size=args.trim_batch_size,
+        torch_threads=args.torch_threads,
+        chunk_size=args.chunk_size,
+        lease_min=args.lease_min,
+        max_attempts=args.max_attempts,
+        backoff_sec=args.backoff_sec,
+    )
     session.close()
     app_logger.info("Finished processing all datasets")
@@ -0,0 +1,164 @@
+"""Voice activity detection over batches of files.
+
+The pyannote VoiceActivityDetection pipeline runs the segmentation model file by file. With many threads calling it
+at once they contend on the same model and every forward pass only holds the chunks of one short clip. BatchedVAD
+collects the clips submitted from any thread and runs the sliding windows of many files in the same batches, with a
+fixed number of torch threads. The windows, the forward pass and the aggregation are the ones of the pyannote Inference
+used by the pipeline. The one difference is the last window of a file, or the whole file when it is shorter than a
+window: the pipeline runs it alone at its own length while BatchedVAD zero pads it to a window, as later pyannote
+releases do, so that the short clips of a dataset share batches too. The model sees the padding, so the speech
+boundaries in that window may move by a few frames.
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import List
+
+import numpy as np
+import torch
+from pyannote.audio import Inference, Model
+from pyannote.audio.utils.signal import Binarize
+from pyannote.core import SlidingWindow, SlidingWindowFeature, Timeline
+
+from src.logger import root_logger
+
+
+app_logger = root_logger.getChild("vad")
+
+# windows per forward pass, files run together, how long to wait for more files and torch intra-op threads
+VAD_BATCH_SIZE = int(os.environ.get("VAD_BATCH_SIZE", 64))
+VAD_MAX_FILES = int(os.environ.get("VAD_MAX_FILES", 32))
+VAD_MAX_WAIT_SEC = float(os.environ.get("VAD_MAX_WAIT_MS", 50)) / 1000
+VAD_TORCH_THREADS = int(os.environ.get("VAD_TORCH_THREADS") or os.cpu_count())
+
+
+class BatchedVAD:
+    """Batched voice activity detection with the pyannote segmentation model.
+
+    Callers either pass a list of files to run, or call the instance with a single file from any number of threads:
+    the files submitted within max_wait seconds of each other are then run in the same batches.
+    """
+
+    def __init__(
+        self,
+        model: Model,
+        onset: float = 0.5,
+        offset: float = 0.5,
+        min_duration_on: float = 0.0,
+        min_duration_off: float = 0.05,
+        batch_size: int = VAD_BATCH_SIZE,
+        max_files: int = VAD_MAX_FILES,
+        max_wait: float = VAD_MAX_WAIT_SEC,
+        num_threads: int = VAD_TORCH_THREADS,
+    ):
+        # the speech probability of a frame is the max over the speakers, as in the VoiceActivityDetection pipeline
+        self.inference = Inference(model, batch_size=batch_size, pre_aggregation_hook=lambda scores: np.max(scores, axis=-1, keepdims=True))
+        sample_rate = model.audio.sample_rate
+        self.window_size, self.step_size = round(self.inference.duration * sample_rate), round(self.inference.step * sample_rate)
+        self.num_frames_per_chunk = model.introspection(self.window_size)[0]
+        self.binarize = Binarize(onset=onset, offset=offset, min_duration_on=min_duration_on, min_duration_off=min_duration_off)
+        self.batch_size = batch_size
+        self.max_files = max_files
+        self.max_wait = max_wait
+        torch.set_num_threads(num_threads)
+
+        self._queue: queue.Queue = queue.Queue()
+        self._worker = threading.Thread(target=self._serve, name="batched-vad", daemon=True)
+        self._worker.start()
+
+    def __call__(self, path: str) -> Timeline:
+        return self.submit(path).result()
+
+    def submit(self, path: str) -> Future:
+        """Queue a file for the next batch.
+
+        The audio is decoded in the calling thread, so decoding runs in parallel and the model thread only does inference.
+
+        Args:
+            path (str): The audio file.
+
+        Returns:
+            Future: Resolves to the speech timeline of the file.
+        """
+        future: Future = Future()
+        try:
+            waveform, _ = self.inference.model.audio(path)
+            self._queue.put((waveform, future))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def run(self, paths: List[str]) -> List[Timeline]:
+        """Get the speech timelines of files, running their windows in shared batches.
+
+        Args:
+            paths (List[str]): The audio files.
+
+        Returns:
+            List[Timeline]: The speech timeline of each file.
+        """
+        return self._detect([self.inference.model.audio(path)[0] for path in paths])
+
+    def _serve(self):
+        while True:
+            requests = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(requests) < self.max_files:
+                try:
+                    requests.append(self._queue.get(timeout=max(0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            try:
+                timelines = self._detect([waveform for waveform, _ in requests])
+                for (_, future), timeline in zip(requests, timelines):
+                    future.set_result(timeline)
+            except Exception as e:
+                app_logger.error(f"Failed to run VAD on a batch of {len(requests)} files. Error: {e}")
+                for _, future in requests:
+                    future.set_exception(e)
+
+    def _chunks(self, waveform: torch.Tensor):
+        # the windows of Inference.slide. the remainder, or the whole clip if it is shorter than a window, is zero
+        # padded to a window so that it is batched with the others, pad is the number of its frames past the end
+        num_samples = waveform.shape[1]
+        if num_samples >= self.window_size:
+            chunks = waveform.unfold(1, self.window_size, self.step_size).transpose(0, 1)
+        else:
+            chunks = waveform.new_zeros((0, waveform.shape[0], self.window_size))
+        has_last_chunk = num_samples < self.window_size or (num_samples - self.window_size) % self.step_size > 0
+        if not has_last_chunk:
+            return chunks, 0
+        last_chunk = waveform[:, len(chunks) * self.step_size :]
+        pad = self.num_frames_per_chunk - self.inference.model.introspection(last_chunk.shape[1])[0]
+        last_chunk = torch.nn.functional.pad(last_chunk, (0, self.window_size - last_chunk.shape[1]))
+        return torch.cat([chunks, last_chunk[None]]), pad
+
+    def _detect(self, waveforms: List[torch.Tensor]) -> List[Timeline]:
+        chunks, pads = zip(*[self._chunks(waveform) for waveform in waveforms])
+        windows = torch.cat(chunks)
+        outputs = [self.inference.infer(windows[i : i + self.batch_size]) for i in range(0, len(windows), self.batch_size)]
+        scores = self.inference.pre_aggregation_hook(np.concatenate(outputs))
+
+        timelines = []
+        offset = 0
+        for file_chunks, pad in zip(chunks, pads):
+            file_scores = scores[offset : offset + len(file_chunks)].copy()
+            offset += len(file_chunks)
+            if pad:
+                # the frames of the padding only count as missing in the aggregation, as in Inference.slide
+                file_scores[-1, file_scores.shape[1] - pad :] = 0.0
+            timelines.append(self._aggregate(file_scores, pad))
+        return timelines
+
+    def _aggregate(self, scores: np.ndarray, pad: int) -> Timeline:
+        aggregated = Inference.aggregate(
+            SlidingWindowFeature(scores, SlidingWindow(start=0.0, duration=self.inference.duration, step=self.inference.step)),
+            frames=self.inference.model.introspection.frames,
+            warm_up=self.inference.warm_up,
+            hamming=True,
+            missing=0.0,
+        )
+        aggregated.data = aggregated.data[: len(aggregated.data) - pad]
+        return self.binarize(aggregated).get_timeline().support()
@@ -1,6 +1,7 @@
 # This scripts contains the dataset investigate page
 # it select datalaset select list and after selecting the dataset it shows the dataset details
 # and the samples of the dataset
+import json
 import os
 import sys
 
@@ -33,12 +34,17 @@ import matplotlib.pyplot as plt
 from wordcloud import WordCloud  # noqa: F401
 
 
-def get_samples(dataset_id):
-    return requests.get(BACKEND_URL + f"/datasets/{dataset_id}/samples").json()
+def get_progress(dataset_id):
+    return requests.get(BACKEND_URL + f"/datasets/{dataset_id}/progress").json()
 
 
 def get_annotations(dataset_id):
-    return requests.get(BACKEND_URL + f"/datasets/{dataset_id}/annotations").json()
+    # the export is streamed as one json object per line, so it is parsed as it arrives instead of as one large document
+    with requests.get(BACKEND_URL + f"/datasets/{dataset_id}/annotations/export", params={"format": "ndjson"}, stream=True) as response:
+        if response.headers.get("content-type", "").startswith("application/json"):
+            st.error(response.json().get("error"))
+            return []
+        return [json.loads(line) for line in response.iter_lines() if line]
 
 
 def get_annotators(dataset_id):
@@ -125,7 +131,7 @@ def app():
 
     if selected_dataset:
         selected_dataset = [dataset for dataset in datasets if dataset["name"] == selected_dataset][0]
-        samples = pd.DataFrame(get_samples(selected_dataset["id"]))
+        progress = get_progress(selected_dataset["id"])
         annotations = pd.DataFrame(get_annotations(selected_dataset["id"]))
         annotators = pd.DataFrame(get_annotators(selected_dataset["id"]))
 
@@ -138,6 +144,15 @@ def app():
             st.subheader("Annotators")
             display_json(annotators)
 
+        if "n_selected" in progress:
+            st.subheader("Progress")
+            col1, col2, col3 = st.columns(3)
+            col1.metric("Samples", progress["n_samples"])
+            col2.metric("Selected for Delivery", progress["n_selected"])
+            col3.metric("Annotated", progress["n_annotated"])
+            if progress["n_selected"] > 0:
+                st.progress(progress["n_annotated"] / progress["n_selected"])
+
         st.markdown("---")
 
         # st.subheader("Sample Information")
@@ -33,6 +33,8 @@ idx2lang = {v: k for k, v in lang2idx.items()}
 
 app_logger = root_logger.getChild("web_app::annotate")
 BACKEND_URL = "http://{}:{}".format(os.environ.get("SERVER_HOST"), os.environ.get("SERVER_PORT"))
+# number of samples claimed at once and kept in the local queue
+PREFETCH = int(os.environ.get("QA_PREFETCH", 5))
 
 
 # Function to display json data in a structured way
@@ -178,6 +180,12 @@ def app():
     if "stats" not in st.session_state:
         st.session_state["stats"] = None
 
+    if "has_lease" not in st.session_state:
+        st.session_state["has_lease"] = False
+
+    if "queue" not in st.session_state:
+        st.session_state["queue"] = []
+
     def annotate_sample(
         id: int,
         annotator_id: int,
@@ -196,6 +204,7 @@ def app():
         soundArtifacts: bool,
         feedback: str,
         status: str = "NotReviewed",
+        n: int = 0,
     ):
 
         data = {
@@ -216,72 +225,86 @@ def app():
             "feedback": feedback,
             "status": status,
         }
-        response = requests.put(BACKEND_URL + f"/samples/{id}", json=data)
-        if response.status_code == 200:
+        # the annotation, the release of its lock and the claim of the next n samples are a single request
+        response = requests.post(BACKEND_URL + f"/samples/{id}/annotate_and_next", params={"n": n}, json=data)
+        if response.status_code == 200 and "samples" in response.json():
             app_logger.info(f"Sample {id} annotated")
             st.success("Sample annotated")
-            # unlock the sample
-            response = requests.put(BACKEND_URL + f"/samples/{id}/unlock")
-            if response.status_code == 200:
-                app_logger.info(f"Sample {id} unlocked")
-        else:
-            app_logger.error("Sample annotation failed")
-            st.error("Sample annotation failed")
-        return response
+            return response.json()
+        app_logger.error("Sample annotation failed")
+        st.error("Sample annotation failed")
+        return None
+
+    def renew_leases():
+        # every rerun means the annotator is still working, so keep the leases of the current sample and of the queue alive
+        response = requests.put(
+            BACKEND_URL + f"/datasets/{st.session_state['dataset_id']}/locks/renew", params={"annotator_id": st.session_state["annotator_id"]}
+        )
+        if response.status_code != 200 or "sample_ids" not in response.json():
+            app_logger.warning("Failed to renew the sample locks")
+            return
+        held = set(response.json()["sample_ids"])
+        # drop the prefetched samples whose lease expired, they may already be served to another annotator
+        st.session_state["queue"] = [sample for sample in st.session_state["queue"] if sample["id"] in held]
+        if st.session_state["sample"]["id"] not in held:
+            st.warning("The lock on this sample has expired, it may be served to another annotator")
 
     def query():
         if st.session_state["annotate_button"]:
             if st.session_state["user_input"]["status"] in ["Discarded", "Reviewed"]:
                 st.session_state["user_input"].update({"id": st.session_state["sample"]["id"], "annotator_id": st.session_state["annotator_id"]})
-                response = annotate_sample(**st.session_state["user_input"])
+                # refill the queue with the same request once it runs dry
+                n = 0 if st.session_state["queue"] else PREFETCH
+                response = annotate_sample(n=n, **st.session_state["user_input"])
+                if response is not None:
+                    st.session_state["queue"].extend(response["samples"])
+                    st.session_state["stats"] = response["stats"]
             st.session_state["annotate_button"] = False
 
         try:
-            # send a request to get next sample
-            response = requests.get(BACKEND_URL + f"/datasets/{st.session_state['dataset_id']}/next_sample")
-            if response.status_code == 200:
+            if not st.session_state["queue"]:
+                # refill the local queue, the backend selects and locks the whole batch in one transaction
+                response = requests.post(
+                    BACKEND_URL + f"/datasets/{st.session_state['dataset_id']}/claim_batch",
+                    params={"annotator_id": st.session_state["annotator_id"], "n": PREFETCH},
+                )
+                if response.status_code != 200:
+                    st.error(f"Failed to get next sample, status code: {response.status_code}")
+                    app_logger.error(f"Failed to get next sample, status code: {response.status_code}")
+                    return
                 response = response.json()
                 if "message" in response:
-
                     st.session_state["sample"] = None
                     st.session_state["stats"] = None
-                    if "error" in response:
-                        app_logger.error(f"Failed to get next sample. Error: {response['error']}")
-                        return
-
-                sample = response["sample"]
-                stats = response["stats"]
-                st.session_state["sample"] = sample
-                st.session_state["stats"] = stats
-                if sample is not None:
-                    st.session_state["user_input"] = {
-                        "final_text": sample["original_text"],
-                        "final_sentence_type": sample["sentence_type"],
-                        "isRepeated": True,
-                        # "isAccentRight": False,
-                        # "isPronunciationRight": False,
-                        # "isClean": False,
-                        # "isPausesRight": False,
-                        # "isSpeedRight": False,
-                        # "isConsisent": False,
-                        "incorrectProsody": True,
-                        "inconsistentTextAudio": True,
-                        "incorrectTrancuation": True,
-                        "soundArtifacts": True,
-                        "feedback": "",
-                        "status": "NotReviewed",
-                    }
-
-                    # lock the sample
-
-                    response = requests.put(BACKEND_URL + f"/samples/{sample['id']}/lock")
-                    if response.status_code == 200:
-                        app_logger.info(f"Sample {sample['id']} locked")
-                    st.session_state["query_button"] = False
-                    app_logger.info("Next sample retrieved")
-            else:
-                st.error(f"Failed to get next sample, status code: {response.status_code}")
-                app_logger.error(f"Failed to get next sample, status code: {response.status_code}")
+                    app_logger.error(f"Failed to get next sample. Error: {response.get('error')}")
+                    return
+                st.session_state["queue"] = response["samples"]
+                st.session_state["stats"] = response["stats"]
+                app_logger.info(f"Claimed {len(response['samples'])} samples")
+
+            sample = st.session_state["queue"].pop(0) if st.session_state["queue"] else None
+            st.session_state["sample"] = sample
+            st.session_state["has_lease"] = sample is not None
+            if sample is not None:
+                st.session_state["user_input"] = {
+                    "final_text": sample["original_text"],
+                    "final_sentence_type": sample["sentence_type"],
+                    "isRepeated": True,
+                    # "isAccentRight": False,
+                    # "isPronunciationRight": False,
+                    # "isClean": False,
+                    # "isPausesRight": False,
+                    # "isSpeedRight": False,
+                    # "isConsisent": False,
+                    "incorrectProsody": True,
+                    "inconsistentTextAudio": True,
+                    "incorrectTrancuation": True,
+                    "soundArtifacts": True,
+                    "feedback": "",
+                    "status": "NotReviewed",
+                }
+                st.session_state["query_button"] = False
+                app_logger.info("Next sample retrieved")
         except Exception as e:
             app_logger.error(f"Failed to get next sample. Error: {traceback.format_exc()}")
 
@@ -292,7 +315,11 @@ def app():
         if "message" in response:
             st.warning(response["message"])
         else:
+            if st.session_state["has_lease"]:
+                # the claimed sample is still ours, serve it again after the latest annotation
+                st.session_state["queue"].insert(0, st.session_state["sample"])
             st.session_state["sample"] = response
+            st.session_state["has_lease"] = False
             st.session_state["query_button"] = False
             st.session_state["annotate_button"] = False
 
@@ -310,10 +337,16 @@ def app():
         st.session_state["query_button"] = True
         st.session_state["annotate_button"] = False
         st.session_state["isFirstRun"] = True
-        if st.session_state["sample"] is not None:
-            response = requests.put(BACKEND_URL + f"/samples/{int(st.session_state['sample']['id'])}/unlock")
+        if st.session_state["prev_dataset_id"] is not None:
+            # give back the current sample and the queue of the previous dataset
+            response = requests.put(
+                BACKEND_URL + f"/datasets/{st.session_state['prev_dataset_id']}/locks/release", params={"annotator_id": st.session_state["annotator_id"]}
+            )
             if response.status_code == 200:
-                app_logger.info(f"Sample {int(st.session_state['sample']['id'])} unlocked")
+                app_logger.info(f"Samples of dataset {st.session_state['prev_dataset_id']} unlocked")
+        st.session_state["sample"] = None
+        st.session_state["has_lease"] = False
+        st.session_state["queue"] = []
         st.experimental_rerun()
 
     if st.session_state["dataset_id"] is not None:
@@ -340,6 +373,8 @@ def app():
             # Input sentence
             # sample_container(st.session_state["sample"])
             sample = st.session_state["sample"]
+            if st.session_state["has_lease"]:
+                renew_leases()
             col1, col2, col3 = st.columns(columns_sizes)
             col1.metric("ID", sample["filename"])
             col2.metric("Sentence Type", f"{sample['sentence_type']}")
@@ -0,0 +1,58 @@
+import random
+import string
+
+import numpy as np
+
+from src.utils.alignment_utils import distance_matrix, match_sentences, MAX_ASSIGNED_DISTANCE
+
+
+def synthetic_script(n_sentences=400, seed=0):
+    # a script read in order with typos, fillers, skipped lines, retakes and a jump ahead
+    rng = random.Random(seed)
+    words = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 8))) for _ in range(500)]
+    sentences = [" ".join(rng.choices(words, k=rng.randint(4, 14))) for _ in range(n_sentences)]
+
+    def typo(sentence):
+        chars = list(sentence)
+        for _ in range(max(1, len(chars) // 25)):
+            chars[rng.randrange(len(chars))] = rng.choice(string.ascii_lowercase)
+        return "".join(chars)
+
+    segments, i = [], 0
+    while i < n_sentences:
+        r = rng.random()
+        if r < 0.05:
+            segments.append("uh " + " ".join(rng.choices(words, k=5)))
+        elif r < 0.08:
+            i += rng.randint(1, 5)
+            continue
+        elif r < 0.1 and i > 2:
+            segments.append(typo(sentences[i - 2]))
+        elif r < 0.102:
+            i += 100
+            continue
+        if i < n_sentences:
+            segments.append(typo(sentences[i]))
+        i += 1
+    return segments + [""], sentences
+
+
+def test_distance_matrix():
+    distances = distance_matrix(["abcd", "", None], ["abce", "ab", ""])
+    assert distances.shape == (3, 3)
+    np.testing.assert_allclose(distances[0, :2], [0.25, 1.0])
+    assert np.isinf(distances[0, 2])
+    assert np.isinf(distances[1:]).all()
+
+
+def test_banded_matches_full_search():
+    segments, sentences = synthetic_script()
+    full_matches, full_distances = match_sentences(segments, sentences, band=0)
+    banded_matches, banded_distances = match_sentences(segments, sentences, band=20)
+
+    assigned = full_distances < MAX_ASSIGNED_DISTANCE
+    assert assigned.sum() > 0.8 * len(segments)
+    np.testing.assert_array_equal(banded_matches[assigned], full_matches[assigned])
+    np.testing.assert_allclose(banded_distances[assigned], full_distances[assigned])
+    # the segments left unassigned by the full search stay unassigned
+    assert (banded_distances[~assigned] >= MAX_ASSIGNED_DISTANCE).all()
@@ -0,0 +1,95 @@
+import threading
+import time
+
+import pytest
+
+from src.utils import asr_cache, audio
+from src.utils.asr_client import FakeASRBackend
+from src.utils.registry import ModelRegistry
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(asr_cache, "DB_PATH", tmp_path / "asr.sqlite")
+    monkeypatch.setattr(asr_cache, "MAX_BYTES", 1024**2)
+    monkeypatch.setattr(asr_cache, "_local", threading.local())
+    monkeypatch.setattr(asr_cache, "_size", None)
+    return asr_cache
+
+
+class CountingBackend(FakeASRBackend):
+    cached = True
+
+    def __init__(self, **kwargs):
+        super().__init__(latency_ms=1, **kwargs)
+        self.calls = []
+
+    async def _run_job(self, provider, model_id, data):
+        self.calls.append(data)
+        return await super()._run_job(provider, model_id, data)
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    registry = ModelRegistry()
+    registry.register("asr_client", CountingBackend)
+    monkeypatch.setattr(audio, "models", registry)
+    yield registry.get("asr_client")
+    registry.get("asr_client").close()
+
+
+def test_store_and_fetch(cache):
+    details = {"segments": [{"text": "alpha bravo", "start_time": 0.1, "end_time": 0.9}]}
+    assert cache.fetch("a" * 64, "aws", "model", "en") is None
+    cache.store("a" * 64, "aws", "model", "en", details)
+    assert cache.fetch("a" * 64, "aws", "model", "en") == details
+    # every part of the key matters
+    assert cache.fetch("b" * 64, "aws", "model", "en") is None
+    assert cache.fetch("a" * 64, "azure", "model", "en") is None
+    assert cache.fetch("a" * 64, "aws", "other", "en") is None
+    assert cache.fetch("a" * 64, "aws", "model", "fr") is None
+
+
+def test_expired_entries_are_misses(cache, monkeypatch):
+    cache.store("a" * 64, "aws", "model", "en", [])
+    monkeypatch.setattr(cache, "TTL_SEC", -1)
+    assert cache.fetch("a" * 64, "aws", "model", "en") is None
+
+
+def test_evicts_the_least_recently_used(cache, monkeypatch):
+    monkeypatch.setattr(cache, "MAX_BYTES", 250)
+    for key in ["a", "b", "c"]:
+        cache.store(key * 64, "aws", "model", "en", "x" * 100)
+        time.sleep(0.01)
+    # b and c fit in 90% of the cache, a is the least recently used
+    assert cache.fetch("a" * 64, "aws", "model", "en") is None
+    assert cache.fetch("c" * 64, "aws", "model", "en") == "x" * 100
+
+
+def test_run_asr_is_cached_by_content(tmp_path, cache, backend):
+    first, second = tmp_path / "a.wav", tmp_path / "b.wav"
+    first.write_bytes(b"audio")
+    second.write_bytes(b"audio")
+    details = audio.run_asr("aws", "s3://bucket/a.wav", local_path=str(first))
+    # the same audio under another path is not sent again
+    assert audio.run_asr("aws", "s3://bucket/b.wav", local_path=str(second)) == details
+    assert backend.calls == ["s3://bucket/a.wav"]
+    audio.run_asr("aws", "s3://bucket/a.wav", language="fr", local_path=str(first))
+    audio.run_asr("azure", "s3://bucket/a.wav", local_path=str(first))
+    assert len(backend.calls) == 3
+
+
+def test_submit_asr_only_sends_the_misses(tmp_path, cache, backend):
+    paths = []
+    for i in range(4):
+        paths.append(tmp_path / f"{i}.wav")
+        paths[-1].write_bytes(f"audio {i}".encode())
+    audio.run_asr("aws", "s3://bucket/0.wav", local_path=str(paths[0]))
+    futures = [audio.submit_asr("aws", f"s3://bucket/{i}.wav", local_path=str(path)) for i, path in enumerate(paths)]
+    # the cache hit is resolved without the client
+    assert futures[0].done()
+    assert all("segments" in future.result() for future in futures)
+    assert sorted(backend.calls) == ["s3://bucket/0.wav", "s3://bucket/1.wav", "s3://bucket/2.wav", "s3://bucket/3.wav"]
+    # the details are cached once their request completes
+    assert audio.submit_asr("aws", "s3://bucket/3.wav", local_path=str(paths[3])).result() == futures[3].result()
+    assert len(backend.calls) == 4
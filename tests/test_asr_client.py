@@ -0,0 +1,69 @@
+import time
+
+import pytest
+
+from src.utils import asr_client
+from src.utils.asr_client import ASRBackend, ASRError, ASRRateLimitError, ASRUnavailableError, backoff, FakeASRBackend
+
+
+def test_backoff_is_jittered_under_the_exponential_cap():
+    for attempt in range(10):
+        delays = [backoff(attempt, base=1, cap=30) for _ in range(200)]
+        assert all(0 <= delay <= min(30, 2**attempt) for delay in delays)
+        assert len(set(delays)) > 1
+
+
+def test_backend_is_abstract():
+    with pytest.raises(TypeError):
+        ASRBackend()
+
+
+def test_fake_backend_is_deterministic():
+    first, second = FakeASRBackend(latency_ms=1, seed=3), FakeASRBackend(latency_ms=1, seed=3)
+    try:
+        assert first.run("aws", "model", "s3://bucket/a.wav") == second.run("aws", "model", "s3://bucket/a.wav")
+        assert first.run("aws", "model", "s3://bucket/a.wav") != first.run("aws", "model", "s3://bucket/b.wav")
+        assert isinstance(first.run("azure", "model", "s3://bucket/a.wav"), list)
+        assert "segments" in first.run("aws", "model", "s3://bucket/a.wav")
+    finally:
+        first.close()
+        second.close()
+
+
+def test_retries_then_typed_failure(monkeypatch):
+    monkeypatch.setattr(asr_client, "backoff", lambda attempt: 0)
+    always_failing = FakeASRBackend(latency_ms=1, failure_rate=1.0, max_attempts=3)
+    never_failing = FakeASRBackend(latency_ms=1, failure_rate=0.0, max_attempts=3)
+    try:
+        with pytest.raises(ASRError) as error:
+            always_failing.run("aws", "model", "s3://bucket/a.wav")
+        assert error.value.retryable
+        assert always_failing._attempts[("aws", "model", "s3://bucket/a.wav")] == 3
+        results = never_failing.run_many("aws", "model", [f"s3://bucket/{i}.wav" for i in range(20)])
+        assert not any(isinstance(result, ASRError) for result in results)
+        assert isinstance(ASRUnavailableError("x"), ASRError)
+    finally:
+        always_failing.close()
+        never_failing.close()
+
+
+class RateLimitedOnce(FakeASRBackend):
+    async def _run_job(self, provider, model_id, data):
+        if data == "s3://bucket/limited.wav" and not self._attempts:
+            self._attempts[data] = 1
+            raise ASRRateLimitError("Too many requests", retry_after=2, provider=provider, data=data)
+        return self.details(provider, model_id, data)
+
+
+def test_backoff_does_not_hold_a_provider_slot():
+    client = RateLimitedOnce(concurrency={"aws": 1})
+    try:
+        limited = client.submit("aws", "model", "s3://bucket/limited.wav")
+        start = time.perf_counter()
+        client.run("aws", "model", "s3://bucket/other.wav")
+        # the only slot is free while the rate limited job waits for its retry
+        assert time.perf_counter() - start < 1
+        assert not limited.done()
+        assert "segments" in limited.result()
+    finally:
+        client.close()
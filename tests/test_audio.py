@@ -0,0 +1,75 @@
+import struct
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+from src.utils.audio import evaluate_wav, read_wav_header
+
+
+SAMPLE_RATE = 22050
+
+
+def write_wav(path, subtype, n_channel=1, format="WAV", peak=0.5):
+    t = np.arange(SAMPLE_RATE // 10) / SAMPLE_RATE
+    audio = np.stack([peak * np.sin(2 * np.pi * 440 * (c + 1) * t) for c in range(n_channel)], axis=1)
+    sf.write(path, audio, SAMPLE_RATE, subtype=subtype, format=format)
+    return str(path)
+
+
+@pytest.mark.parametrize(
+    "subtype,format_tag,bits,dtype",
+    [("PCM_U8", 1, 8, np.uint8), ("PCM_16", 1, 16, np.int16), ("PCM_32", 1, 32, np.int32), ("FLOAT", 3, 32, np.float32)],
+)
+def test_read_wav_header(tmp_path, subtype, format_tag, bits, dtype):
+    path = write_wav(tmp_path / "clip.wav", subtype)
+    header = read_wav_header(path)
+    assert (header["format_tag"], header["bits"], header["n_channel"], header["sampling_rate"]) == (format_tag, bits, 1, SAMPLE_RATE)
+    # the data chunk holds exactly the samples soundfile wrote
+    assert header["data_size"] == sf.info(path).frames * bits // 8
+    with open(path, "rb") as f:
+        f.seek(header["data_offset"])
+        samples = np.frombuffer(f.read(header["data_size"]), dtype=np.dtype(dtype).newbyteorder("<"))
+    if dtype == np.uint8:
+        # soundfile reads unsigned 8 bit samples centered and scaled to 16 bit
+        assert np.array_equal((samples.astype(np.int16) - 128) * 256, sf.read(path, dtype="int16")[0])
+    else:
+        assert np.array_equal(samples, sf.read(path, dtype=np.dtype(dtype).name)[0])
+
+
+def test_read_wav_header_extensible(tmp_path):
+    path = write_wav(tmp_path / "clip.wav", "PCM_16", n_channel=4, format="WAVEX")
+    header = read_wav_header(path)
+    assert (header["format_tag"], header["bits"], header["n_channel"]) == (1, 16, 4)
+    assert header["data_size"] == sf.info(path).frames * 4 * 2
+
+
+def test_read_wav_header_skips_unknown_chunks(tmp_path):
+    # an odd sized chunk before the data chunk, padded to an even size
+    path = write_wav(tmp_path / "clip.wav", "PCM_16")
+    with open(path, "rb") as f:
+        content = f.read()
+    data = content.index(b"data")
+    junk = b"junk" + struct.pack("<I", 3) + b"abc\x00"
+    content = content[:data] + junk + content[data:]
+    content = content[:4] + struct.pack("<I", len(content) - 8) + content[8:]
+    with open(path, "wb") as f:
+        f.write(content)
+    assert read_wav_header(path)["data_offset"] == data + len(junk) + 8
+
+
+def test_read_wav_header_unsupported(tmp_path):
+    assert read_wav_header(write_wav(tmp_path / "clip.wav", "PCM_24")) is None
+    assert read_wav_header(write_wav(tmp_path / "clip.flac", "PCM_16", format="FLAC")) is None
+    (tmp_path / "empty.wav").write_bytes(b"")
+    assert read_wav_header(str(tmp_path / "empty.wav")) is None
+
+
+def test_evaluate_wav(tmp_path):
+    # -4.4 dBFS, within the delivery window
+    path = write_wav(tmp_path / "clip.wav", "PCM_16", peak=0.6)
+    response = evaluate_wav(path)
+    assert (response["sample_format"], response["codec"], response["n_channel"]) == ("s16", "pcm_s16le", 1)
+    assert response["duration"] == pytest.approx(0.1, abs=1 / SAMPLE_RATE)
+    assert response["peak_volume_db"] == pytest.approx(20 * np.log10(0.6), abs=0.01)
+    assert response["isPCM"] and response["is_16bit"] and not response["is_88khz"]
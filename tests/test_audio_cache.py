@@ -0,0 +1,75 @@
+import os
+
+import pytest
+
+from src.utils import audio_cache
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(audio_cache, "CACHE_DIR", tmp_path / "cache")
+    monkeypatch.setattr(audio_cache, "MAX_BYTES", 1024**2)
+    monkeypatch.setattr(audio_cache, "_size", None)
+    return tmp_path / "cache"
+
+
+def test_content_hash_follows_the_content(tmp_path):
+    first, second = tmp_path / "a.wav", tmp_path / "b.wav"
+    first.write_bytes(b"audio")
+    second.write_bytes(b"audio")
+    assert audio_cache.content_hash(str(first)) == audio_cache.content_hash(str(second))
+    # a modified file is hashed again
+    first.write_bytes(b"other audio")
+    assert audio_cache.content_hash(str(first)) != audio_cache.content_hash(str(second))
+
+
+def test_make_key(tmp_path):
+    path = tmp_path / "a.wav"
+    path.write_bytes(b"audio")
+    key = audio_cache.make_key(str(path), "trim", start=0.1, end=2.0)
+    assert key == audio_cache.make_key(str(path), "trim", end=2.0, start=0.1)
+    assert key != audio_cache.make_key(str(path), "trim", start=0.1, end=2.5)
+    assert key != audio_cache.make_key(str(path), "normalize", start=0.1, end=2.0)
+
+
+def test_store_and_fetch(tmp_path, cache_dir):
+    source, out_path = tmp_path / "a.wav", tmp_path / "out.wav"
+    source.write_bytes(b"converted audio")
+    assert audio_cache.fetch("ab" * 32) is None
+    audio_cache.store("ab" * 32, str(source), {"duration": 1.5})
+    assert audio_cache.fetch("ab" * 32, str(out_path)) == {"duration": 1.5}
+    assert out_path.read_bytes() == b"converted audio"
+    # a metadata only entry
+    audio_cache.store("cd" * 32, meta={"peak": -3})
+    assert audio_cache.fetch("cd" * 32) == {"peak": -3}
+    assert audio_cache.fetch("cd" * 32, str(tmp_path / "missing.wav")) is None
+
+
+def test_evicts_the_least_recently_used(tmp_path, cache_dir, monkeypatch):
+    # room for three entries, the fourth one evicts the oldest
+    monkeypatch.setattr(audio_cache, "MAX_BYTES", 350)
+    for i, key in enumerate(["aa" * 32, "bb" * 32, "cc" * 32]):
+        audio_cache.store(key, meta={"padding": "x" * 80})
+        os.utime(audio_cache._entry(key, ".json"), (i, i))
+    audio_cache.store("dd" * 32, meta={"padding": "x" * 80})
+    assert audio_cache.fetch("aa" * 32) is None
+    assert all(audio_cache.fetch(key) is not None for key in ["bb" * 32, "cc" * 32, "dd" * 32])
+
+
+def test_cached_conversion(tmp_path, cache_dir):
+    calls = []
+
+    @audio_cache.cached_conversion
+    def convert(path, out_path):
+        calls.append(path)
+        with open(path, "rb") as source, open(out_path, "wb") as out:
+            out.write(source.read().upper())
+        return out_path
+
+    source = tmp_path / "a.wav"
+    source.write_bytes(b"audio")
+    for i in range(2):
+        out_path = str(tmp_path / f"out_{i}.wav")
+        assert convert(str(source), out_path) == out_path
+        assert open(out_path, "rb").read() == b"AUDIO"
+    assert len(calls) == 1
@@ -0,0 +1,92 @@
+import os
+from glob import glob
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+
+pytest.importorskip("pyannote.audio")
+if not os.getenv("HUGGINGFACE_TOKEN"):
+    pytest.skip("the segmentation model needs HUGGINGFACE_TOKEN", allow_module_level=True)
+
+from src.utils.audio import HYPER_PARAMETERS, load_segmentation_model  # noqa: E402
+from src.utils.vad import BatchedVAD  # noqa: E402
+
+
+SAMPLE_RATE = 16000
+# frame step of the segmentation model is ~17ms, batching may move a boundary by a frame through float rounding.
+# the last window of a file is zero padded in BatchedVAD, its boundaries may move by a few frames
+TOLERANCE_SEC = 0.02
+PADDED_TOLERANCE_SEC = 0.1
+
+
+def synthetic_clip(path, duration, seed):
+    # bursts of voiced-like harmonics over low noise, so that the clip has speech-like and silent regions
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(duration * SAMPLE_RATE)) / SAMPLE_RATE
+    audio = 0.005 * rng.standard_normal(len(t))
+    start = rng.uniform(0.1, 0.5)
+    while start < duration:
+        end = min(duration, start + rng.uniform(0.3, 1.5))
+        burst = (t >= start) & (t < end)
+        f0 = rng.uniform(100, 220)
+        audio[burst] += sum(0.3 / k * np.sin(2 * np.pi * k * f0 * t[burst]) for k in range(1, 8))
+        start = end + rng.uniform(0.2, 1.0)
+    sf.write(path, audio.astype(np.float32), SAMPLE_RATE)
+    return str(path)
+
+
+@pytest.fixture(scope="module")
+def models():
+    from pyannote.audio.pipelines import VoiceActivityDetection
+
+    segmentation = load_segmentation_model()
+    pipeline = VoiceActivityDetection(segmentation=segmentation)
+    pipeline.instantiate(HYPER_PARAMETERS)
+    return pipeline, BatchedVAD(segmentation, **HYPER_PARAMETERS)
+
+
+@pytest.fixture(scope="module")
+def clips(tmp_path_factory):
+    # shorter than a window like most recordings, exactly a window, and longer ones with and without a remainder after
+    # the last step. VAD_TEST_CLIPS adds the wav files of a directory, e.g. a few recordings of a dataset
+    tmp_path = tmp_path_factory.mktemp("clips")
+    durations = [0.8, 1.3, 2.1, 2.7, 3.4, 4.6, 5.0, 5.5, 9.37, 23.0]
+    paths = [synthetic_clip(tmp_path / f"clip_{i}.wav", duration, i) for i, duration in enumerate(durations)]
+    if os.getenv("VAD_TEST_CLIPS"):
+        paths += sorted(glob(os.path.join(os.environ["VAD_TEST_CLIPS"], "*.wav")))
+    return paths
+
+
+def assert_same_speech(timeline, expected, path, tolerance=TOLERANCE_SEC):
+    timeline, expected = list(timeline), list(expected)
+    assert len(timeline) == len(expected), path
+    for segment, expected_segment in zip(timeline, expected):
+        assert abs(segment.start - expected_segment.start) <= tolerance, path
+        assert abs(segment.end - expected_segment.end) <= tolerance, path
+
+
+def test_batched_vad_matches_pipeline(models, clips):
+    pipeline, batched_vad = models
+    for path, timeline in zip(clips, batched_vad.run(clips)):
+        assert_same_speech(timeline, pipeline(path).get_timeline().support(), path, tolerance=PADDED_TOLERANCE_SEC)
+
+
+def test_short_clips_share_batches(models, clips, monkeypatch):
+    # the clips shorter than a window are one padded window each, all of them fit in a single forward pass
+    _, batched_vad = models
+    short_clips = [path for path in clips if sf.info(path).duration < batched_vad.inference.duration]
+    batch_sizes = []
+    infer = batched_vad.inference.infer
+    monkeypatch.setattr(batched_vad.inference, "infer", lambda chunks: batch_sizes.append(len(chunks)) or infer(chunks))
+    assert len(batched_vad.run(short_clips)) == len(short_clips)
+    assert batch_sizes == [len(short_clips)]
+
+
+def test_concurrent_calls_match_run(models, clips):
+    # the files submitted together are batched differently than in run
+    _, batched_vad = models
+    futures = [batched_vad.submit(path) for path in clips]
+    for path, future, timeline in zip(clips, futures, batched_vad.run(clips)):
+        assert_same_speech(future.result(), timeline, path)